@@ -0,0 +1,174 @@
+"""
+agent_context.py — Tool-result memoization and context budgeting for client.py
+
+`ToolMemo` wraps the LangChain tools loaded from the MCP server so identical
+calls (same tool, same arguments) within a TTL are answered locally, and
+concurrent identical calls share one round trip. Tools with side effects or
+that report live state are never memoized.
+
+`ContextBudget` keeps what the model reads per turn roughly constant: older
+chat turns are folded into a short digest once the history exceeds the token
+budget, and tool payloads the agent has already acted on are truncated before
+each model call (as the ReAct agent's `pre_model_hook`).
+"""
+
+import os
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.tools import BaseTool, StructuredTool
+
+from cache import TTLCache
+from upstream import SingleFlight
+
+MEMO_TTL = float(os.getenv("TOOL_MEMO_TTL", "60"))
+MEMO_SIZE = int(os.getenv("TOOL_MEMO_SIZE", "256"))
+# Per-tool TTLs; 0 disables memoization (side effects, or state that must be
+# read live).
+MEMO_TTLS = {
+    "list_prediction_market_orderbooks": 5.0,
+    "subscribe_prediction_market_orderbooks": 0.0,
+    "unsubscribe_prediction_market_orderbooks": 0.0,
+    "server_stats": 0.0,
+}
+
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))
+# Characters kept of a tool result once the agent has moved past it.
+CONTEXT_TOOL_CHARS = int(os.getenv("CONTEXT_TOOL_CHARS", "2000"))
+CHARS_PER_TOKEN = 4  # rough estimate; exact counts need the model's tokenizer
+
+Turn = Tuple[str, str]  # (role, text), the form client.py keeps its history in
+
+
+# ─── Tool memoization ──────────────────────────────────────────────────────
+class ToolMemo:
+    """
+    TTL cache of tool results keyed on (tool name, canonical JSON arguments).
+    Failed calls are not cached.
+    """
+
+    def __init__(
+        self,
+        ttl: float = MEMO_TTL,
+        maxsize: int = MEMO_SIZE,
+        ttls: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.ttls = MEMO_TTLS if ttls is None else ttls
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.flights = SingleFlight()
+
+    def wrap(self, tools: Sequence[BaseTool]) -> List[BaseTool]:
+        return [self._wrap(tool) for tool in tools]
+
+    def _wrap(self, tool: BaseTool) -> BaseTool:
+        ttl = self.ttls.get(tool.name, self.cache.ttl)
+        if ttl <= 0 or tool.coroutine is None:
+            return tool
+        call = tool.coroutine
+        name = tool.name
+
+        async def coroutine(**kwargs: Any) -> Any:
+            key = (name, json.dumps(kwargs, sort_keys=True, default=str))
+            hit = self.cache.get(key)
+            if hit is not None:
+                return hit
+            result = await self.flights.ado(key, lambda: call(**kwargs))
+            self.cache.set(key, result, ttl)
+            return result
+
+        return StructuredTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            coroutine=coroutine,
+            response_format=tool.response_format,
+            metadata=tool.metadata,
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), "coalesced": self.flights.saved}
+
+
+# ─── Context budgeting ─────────────────────────────────────────────────────
+def estimate_tokens(content: Any) -> int:
+    text = content if isinstance(content, str) else json.dumps(content, default=str)
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _clip(text: str, chars: int) -> str:
+    if len(text) <= chars:
+        return text
+    return f"{text[:chars]}… [{len(text) - chars} more characters truncated]"
+
+
+class ContextBudget:
+    """
+    Token budget for what the model is sent on each call.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CONTEXT_MAX_TOKENS,
+        tool_chars: int = CONTEXT_TOOL_CHARS,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.tool_chars = tool_chars
+
+    def compact(self, history: List[Turn]) -> List[Turn]:
+        """
+        The leading system prompt, then as many of the latest turns as fit in
+        half the budget (the newest one always); older turns are replaced by
+        a digest of their first lines. `history` itself is left untouched.
+        """
+        head = history[:1] if history and history[0][0] == "system" else []
+        turns = history[len(head) :]
+        budget = self.max_tokens // 2
+        kept: List[Turn] = []
+        for turn in reversed(turns):
+            cost = estimate_tokens(turn[1])
+            if kept and cost > budget:
+                break
+            kept.insert(0, turn)
+            budget -= cost
+        older = turns[: len(turns) - len(kept)]
+        if not older:
+            return head + kept
+        return head + [("system", self._digest(older))] + kept
+
+    def _digest(self, turns: List[Turn]) -> str:
+        lines: List[str] = []
+        budget = self.max_tokens // 4
+        for role, text in reversed(turns):
+            line = f"- {role}: {_clip(' '.join(text.split()), 200)}"
+            budget -= estimate_tokens(line)
+            if lines and budget < 0:
+                break
+            lines.insert(0, line)
+        return (
+            "Summary of earlier turns in this conversation (oldest first, "
+            "truncated):\n" + "\n".join(lines)
+        )
+
+    def pre_model_hook(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        For `create_react_agent(pre_model_hook=...)`: truncate tool results
+        that precede the latest model reply; the agent has already acted on
+        them. The agent's stored messages are unchanged.
+        """
+        messages: List[BaseMessage] = state["messages"]
+        last_ai = max(
+            (i for i, m in enumerate(messages) if isinstance(m, AIMessage)),
+            default=-1,
+        )
+        trimmed = [
+            (
+                m.model_copy(update={"content": _clip(m.content, self.tool_chars)})
+                if i < last_ai
+                and isinstance(m, ToolMessage)
+                and isinstance(m.content, str)
+                else m
+            )
+            for i, m in enumerate(messages)
+        ]
+        return {"llm_input_messages": trimmed}
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+benchmarks/fake_clob.py — Local stand-in for the Polymarket CLOB REST API
+
+Usage:
+  python benchmarks/fake_clob.py serve --port 8765 --latency 0.05 --rate 20
+  python benchmarks/fake_clob.py serve --fixtures fixtures/
+  python benchmarks/fake_clob.py record --out fixtures/ --markets 200
+
+Serves `/markets` (cursor paging), `/markets/{condition_id}`, `/book` and
+`/prices-history` from fixtures: either recorded from the live API with
+`record`, or generated deterministically (`Fixtures.synthetic`). Every
+response is delayed by `--latency` seconds, and requests beyond `--rate` per
+second (token bucket, `--burst`) get a 429 with Retry-After, like the real
+CLOB. Point the server and `index.py` at it with `CLOB_HOST`.
+"""
+
+import os
+import json
+import math
+import time
+import base64
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+PAGE_SIZE = 100
+END_CURSOR = "LTE="
+INTERVAL_SECONDS = {
+    "1h": 3600,
+    "6h": 6 * 3600,
+    "1d": 86400,
+    "1w": 7 * 86400,
+    "1m": 30 * 86400,
+}
+HISTORY_DAYS = 365  # synthetic histories start this long ago
+
+WORDS = (
+    "election president senate fed rates bitcoin ethereum price above below "
+    "championship final winner cup league season nba nfl oscar album release "
+    "war ceasefire treaty gdp inflation recession unemployment launch approval"
+).split()
+
+
+# ─── Fixtures ──────────────────────────────────────────────────────────────
+class Fixtures:
+    """
+    Markets, books and price histories served by the fake CLOB.
+
+    Recorded histories are served as stored; tokens without one get a
+    deterministic synthetic series, so any time range can be requested.
+    """
+
+    def __init__(
+        self,
+        markets: List[Dict[str, Any]],
+        books: Optional[Dict[str, Dict[str, Any]]] = None,
+        histories: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+    ) -> None:
+        self.markets = markets
+        self.by_id = {m["condition_id"]: m for m in markets}
+        self.books = books or {}
+        self.histories = histories or {}
+
+    @classmethod
+    def synthetic(cls, n_markets: int = 300, seed: int = 0) -> "Fixtures":
+        rng = random.Random(seed)
+        markets = []
+        for i in range(n_markets):
+            cid = "0x" + f"{rng.getrandbits(256):064x}"
+            words = rng.sample(WORDS, 4)
+            yes = round(rng.uniform(0.02, 0.98), 3)
+            markets.append(
+                {
+                    "condition_id": cid,
+                    "question_id": "0x" + f"{rng.getrandbits(256):064x}",
+                    "question": f"Will {' '.join(words)} happen by 2026? #{i}",
+                    "description": " ".join(rng.choices(WORDS, k=40)),
+                    "market_slug": "-".join(words) + f"-{i}",
+                    "active": rng.random() < 0.8,
+                    "closed": rng.random() < 0.2,
+                    "end_date_iso": f"2026-{rng.randint(1, 12):02d}-"
+                    f"{rng.randint(1, 28):02d}T00:00:00Z",
+                    "volume": round(rng.lognormvariate(9, 2), 2),
+                    "tokens": [
+                        {"token_id": str(rng.getrandbits(64)), "outcome": "Yes",
+                         "price": yes, "winner": False},
+                        {"token_id": str(rng.getrandbits(64)), "outcome": "No",
+                         "price": round(1 - yes, 3), "winner": False},
+                    ],
+                }
+            )  # fmt: skip
+        return cls(markets)
+
+    @classmethod
+    def load(cls, directory: str) -> "Fixtures":
+        with open(os.path.join(directory, "markets.json")) as f:
+            markets = json.load(f)
+        books, histories = {}, {}
+        path = os.path.join(directory, "books.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                books = json.load(f)
+        path = os.path.join(directory, "histories.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                histories = json.load(f)
+        return cls(markets, books, histories)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name, value in (
+            ("markets.json", self.markets),
+            ("books.json", self.books),
+            ("histories.json", self.histories),
+        ):
+            with open(os.path.join(directory, name), "w") as f:
+                json.dump(value, f)
+
+    def book(self, token_id: str) -> Dict[str, Any]:
+        if token_id in self.books:
+            return self.books[token_id]
+        rng = random.Random(token_id)
+        mid = rng.randint(10, 90)
+        return {
+            "market": "",
+            "asset_id": token_id,
+            "timestamp": str(int(time.time() * 1000)),
+            "hash": f"{rng.getrandbits(160):040x}",
+            # Same level order as the CLOB: best bid and best ask come last
+            "bids": [
+                {"price": f"{(mid - i) / 100:.2f}", "size": str(rng.randint(5, 5000))}
+                for i in range(min(mid - 1, 25), 0, -1)
+            ],
+            "asks": [
+                {"price": f"{(mid + i) / 100:.2f}", "size": str(rng.randint(5, 5000))}
+                for i in range(min(99 - mid, 25), 0, -1)
+            ],
+        }
+
+    def history(
+        self,
+        token_id: str,
+        fidelity: int,
+        start_ts: Optional[int],
+        end_ts: Optional[int],
+        interval: Optional[str],
+    ) -> List[Dict[str, Any]]:
+        now = int(time.time())
+        if interval in INTERVAL_SECONDS and not start_ts:
+            start_ts = now - INTERVAL_SECONDS[interval]
+        start_ts = start_ts or now - HISTORY_DAYS * 86400
+        end_ts = min(end_ts or now, now)
+        if token_id in self.histories:
+            return [
+                pt for pt in self.histories[token_id] if start_ts <= pt["t"] <= end_ts
+            ]
+        step = max(1, fidelity) * 60
+        first = -(-max(start_ts, now - HISTORY_DAYS * 86400) // step) * step
+        rng = random.Random(token_id)
+        phase, period = rng.uniform(0, 6.3), rng.uniform(5, 60) * 86400
+        return [
+            {"t": t, "p": round(0.5 + 0.4 * math.sin(t / period + phase), 4)}
+            for t in range(first, end_ts + 1, step)
+        ]
+
+
+def record(host: str, directory: str, n_markets: int) -> Fixtures:
+    """
+    Download `n_markets` markets with their books and daily histories.
+    """
+    session = requests.Session()
+    markets: List[Dict[str, Any]] = []
+    cursor = ""
+    while len(markets) < n_markets and cursor != END_CURSOR:
+        page = session.get(
+            f"{host}/markets", params={"next_cursor": cursor}, timeout=30
+        ).json()
+        markets.extend(page.get("data", []))
+        cursor = page.get("next_cursor") or END_CURSOR
+    markets = markets[:n_markets]
+    books, histories = {}, {}
+    for m in markets:
+        for tok in m.get("tokens", []):
+            tid = tok.get("token_id")
+            if not tid:
+                continue
+            resp = session.get(f"{host}/book", params={"token_id": tid}, timeout=30)
+            if resp.ok:
+                books[tid] = resp.json()
+            resp = session.get(
+                f"{host}/prices-history",
+                params={"market": tid, "interval": "max", "fidelity": 60},
+                timeout=30,
+            )
+            if resp.ok:
+                histories[tid] = resp.json().get("history", [])
+    fixtures = Fixtures(markets, books, histories)
+    fixtures.save(directory)
+    return fixtures
+
+
+# ─── Server ────────────────────────────────────────────────────────────────
+class FakeClob:
+    """
+    Threaded HTTP server over `fixtures`; `requests` counts calls per route.
+    """
+
+    def __init__(
+        self,
+        fixtures: Fixtures,
+        latency: float = 0.0,
+        rate: float = 0.0,
+        burst: float = 50.0,
+        page_size: int = PAGE_SIZE,
+    ) -> None:
+        self.fixtures = fixtures
+        self.latency = latency
+        self.rate = rate
+        self.burst = burst
+        self.page_size = page_size
+        self.requests: Counter = Counter()
+        self.throttled = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def total_requests(self) -> int:
+        with self._lock:
+            return sum(self.requests.values())
+
+    def _admit(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._last) * self.rate
+            )
+            self._last = now
+            if self._tokens < 1:
+                self.throttled += 1
+                return False
+            self._tokens -= 1
+            return True
+
+    def _route(self, path: str, query: Dict[str, str]):
+        fx = self.fixtures
+        if path == "/markets":
+            cursor = query.get("next_cursor") or ""
+            start = int(base64.b64decode(cursor)) if cursor else 0
+            end = start + self.page_size
+            nxt = (
+                base64.b64encode(str(end).encode()).decode()
+                if end < len(fx.markets)
+                else END_CURSOR
+            )
+            data = fx.markets[start:end]
+            return 200, {"limit": self.page_size, "count": len(data),
+                         "next_cursor": nxt, "data": data}  # fmt: skip
+        if path.startswith("/markets/"):
+            market = fx.by_id.get(path.split("/", 2)[2])
+            return (200, market) if market else (404, {"error": "market not found"})
+        if path == "/book":
+            return 200, fx.book(query.get("token_id", ""))
+        if path == "/prices-history":
+            history = fx.history(
+                query.get("market", ""),
+                int(query.get("fidelity") or 1),
+                int(query["startTs"]) if query.get("startTs") else None,
+                int(query["endTs"]) if query.get("endTs") else None,
+                query.get("interval"),
+            )
+            return 200, {"history": history}
+        return 404, {"error": "not found"}
+
+    def start(self, port: int = 0) -> str:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                route = (
+                    "/markets/{id}" if url.path.startswith("/markets/") else url.path
+                )
+                with fake._lock:
+                    fake.requests[route] += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                if not fake._admit():
+                    return self._send(
+                        429, {"error": "rate limited"}, {"Retry-After": "1"}
+                    )
+                self._send(*fake._route(url.path, query))
+
+            def _send(self, status, body, headers=None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+                with fake._lock:
+                    fake.bytes_sent += len(payload)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("command", choices=["serve", "record"])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", help="directory written by `record`")
+    parser.add_argument("--markets", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=0.0)
+    parser.add_argument("--burst", type=float, default=50.0)
+    parser.add_argument("--host", default="https://clob.polymarket.com")
+    parser.add_argument("--out", default="fixtures")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        fx = record(args.host, args.out, args.markets)
+        print(f"Recorded {len(fx.markets)} markets to {args.out}")
+        return
+    fixtures = (
+        Fixtures.load(args.fixtures)
+        if args.fixtures
+        else Fixtures.synthetic(args.markets)
+    )
+    fake = FakeClob(fixtures, args.latency, args.rate, args.burst)
+    print(f"Fake CLOB on {fake.start(args.port)} ({len(fixtures.markets)} markets)")
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+benchmarks/offline.py — Benchmark the indexer and every tool against a local fake CLOB
+
+Usage:
+  python benchmarks/offline.py
+  python benchmarks/offline.py --markets 1000 --concurrency 16 --calls 40 \\
+      --latency 0.05 --rate 20
+  python benchmarks/offline.py --fixtures fixtures/ --json results.json
+  python benchmarks/offline.py --skip-index --tools list_prediction_market_graph
+
+Starts `fake_clob.FakeClob` (REST) and the fake market websocket from
+`orderbook_mirror.py` in-process, points `CLOB_HOST` / `CLOB_WS_URL` and a
+throwaway `CHROMA_PERSIST_DIR` at them, then:
+
+  1. times `index.index_markets` (a full build, then an incremental re-run);
+  2. drives every tool in `server.py` through `mcp.call_tool` with
+     `--concurrency` concurrent callers.
+
+Each phase reports p50/p95/p99 latency, throughput, errors, upstream requests
+per route (as counted by the fake server, including 429s) and peak RSS of
+this process and of its worker processes. No network access is needed.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import asyncio
+import logging
+import argparse
+import tempfile
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import psutil
+except ImportError:  # optional: peak RSS on Windows
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_clob import FakeClob, Fixtures  # noqa: E402
+from orderbook_mirror import FakeMarketChannel, start_server  # noqa: E402
+
+Scenario = Callable[[random.Random], Dict[str, Any]]
+
+
+# ─── Workload ──────────────────────────────────────────────────────────────
+def scenarios(cids: List[str], words: List[str]) -> Dict[str, tuple]:
+    """
+    Tool name -> (argument generator, share of `--calls`). Forecasts fit
+    models, so they get fewer calls; repeated markets exercise the caches.
+    """
+
+    def query(rng: random.Random) -> str:
+        return " ".join(rng.sample(words, 2))
+
+    return {
+        "list_all_prediction_markets": (
+            lambda rng: rng.choice(
+                [
+                    {"query": query(rng)},
+                    {"query": query(rng), "mode": "lexical"},
+                    {"limit": 50, "sort_by": "volume"},
+                    {"condition_id": rng.choice(cids)},
+                ]
+            ),
+            1.0,
+        ),
+        "search_prediction_markets_batch": (
+            lambda rng: {"queries": [query(rng) for _ in range(5)]},
+            1.0,
+        ),
+        "list_prediction_market_orderbooks": (
+            lambda rng: {"condition_ids": rng.sample(cids, 3), "depth": 10},
+            1.0,
+        ),
+        "subscribe_prediction_market_orderbooks": (
+            lambda rng: {"condition_ids": [rng.choice(cids)]},
+            0.25,
+        ),
+        "unsubscribe_prediction_market_orderbooks": (
+            lambda rng: {"condition_ids": [rng.choice(cids)]},
+            0.25,
+        ),
+        "list_prediction_market_graph": (
+            lambda rng: {
+                "condition_id": rng.choice(cids),
+                "interval": rng.choice(["1w", "1m", "max"]),
+                "max_points": 200,
+            },
+            1.0,
+        ),
+        "forecast_scenario_probabilities": (
+            lambda rng: {"condition_id": rng.choice(cids), "selection": "fast"},
+            0.25,
+        ),
+        "forecast_scenario_probabilities_batch": (
+            lambda rng: {"condition_ids": rng.sample(cids, 4), "selection": "fast"},
+            0.1,
+        ),
+        "server_stats": (lambda rng: {}, 0.25),
+    }
+
+
+# ─── Measurement ───────────────────────────────────────────────────────────
+def peak_rss_mb() -> Dict[str, Optional[float]]:
+    """
+    Peak RSS of this process and of its reaped children; None where the
+    platform cannot tell (Windows reports this process only, via psutil).
+    """
+    if resource is None:
+        info = psutil.Process().memory_info() if psutil else None
+        peak = getattr(info, "peak_wset", None)
+        return {
+            "self": round(peak / 1024 / 1024, 1) if peak else None,
+            "children": None,
+        }
+    # ru_maxrss is in KiB on Linux, bytes on macOS
+    scale = 1 / 1024 if sys.platform != "darwin" else 1 / 1024 / 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1),
+        "children": round(
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale, 1
+        ),
+    }
+
+
+def summarize(latencies: List[float], wall: float, errors: int) -> Dict[str, Any]:
+    arr = np.asarray(latencies) * 1000
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99]) if len(arr) else (0, 0, 0)
+    return {
+        "calls": len(latencies),
+        "errors": errors,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "throughput": round(len(latencies) / wall, 2) if wall else None,
+    }
+
+
+class Phase:
+    """
+    Upstream requests and wall time spent inside a `with` block.
+    """
+
+    def __init__(self, fake: FakeClob) -> None:
+        self.fake = fake
+
+    def __enter__(self) -> "Phase":
+        self._requests = Counter(self.fake.requests)
+        self._throttled = self.fake.throttled
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.wall = time.perf_counter() - self._t0
+        self.upstream = dict(Counter(self.fake.requests) - self._requests)
+        self.throttled = self.fake.throttled - self._throttled
+
+
+async def drive(
+    mcp, name: str, make_args: Scenario, calls: int, concurrency: int, seed: int
+):
+    """
+    `calls` calls of tool `name` from `concurrency` concurrent callers.
+    """
+    from mcp.server.fastmcp.exceptions import ToolError
+
+    rng = random.Random(seed)
+    pending = [make_args(rng) for _ in range(calls)]
+    latencies: List[float] = []
+    errors = 0
+
+    async def caller():
+        nonlocal errors
+        while pending:
+            args = pending.pop()
+            t0 = time.perf_counter()
+            try:
+                await mcp.call_tool(name, args)
+            except ToolError:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    return latencies, errors
+
+
+# ─── Runner ────────────────────────────────────────────────────────────────
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _print_row(name: str, row: Dict[str, Any]) -> None:
+    upstream = sum(row["upstream"].values())
+    print(
+        f"{name:<42} {row.get('calls', '-'):>5} {row.get('errors', 0):>4} "
+        f"{row.get('p50_ms', '-'):>9} {row.get('p95_ms', '-'):>9} "
+        f"{row.get('p99_ms', '-'):>9} {row.get('throughput', '-'):>8} "
+        f"{upstream:>8} {row['peak_rss_mb']['self'] or '-':>8}"
+    )
+
+
+def run(args) -> Dict[str, Any]:
+    fixtures = (
+        Fixtures.load(args.fixtures)
+        if args.fixtures
+        else Fixtures.synthetic(args.markets, args.seed)
+    )
+    fake = FakeClob(fixtures, args.latency, args.rate, args.burst)
+    ws_port = _free_port()
+    start_server(FakeMarketChannel(rate=args.ws_rate), ws_port)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="polymarket-bench-")
+    os.environ.update(
+        {
+            "CLOB_HOST": fake.start(),
+            "CLOB_WS_URL": f"ws://127.0.0.1:{ws_port}",
+            "CHROMA_PERSIST_DIR": workdir,
+            "WARMUP": "0",
+            "ORDERBOOK_SNAPSHOT_GRACE": "0.5",
+        }
+    )
+    results: Dict[str, Any] = {
+        "config": {**vars(args), "markets": len(fixtures.markets)},
+        "index": {},
+        "tools": {},
+    }
+    header = (
+        f"{'phase / tool':<42} {'calls':>5} {'err':>4} {'p50 ms':>9} "
+        f"{'p95 ms':>9} {'p99 ms':>9} {'calls/s':>8} {'upstream':>8} {'rss MB':>8}"
+    )
+    print(f"Fake CLOB at {os.environ['CLOB_HOST']}, data in {workdir}")
+
+    runs = (
+        []
+        if args.skip_index
+        else [("index (full)", True), ("index (incremental)", False)]
+    )
+    if runs:
+        import index  # Chroma and the embedding model: not needed with --skip-index
+
+    for label, full in runs:
+        with Phase(fake) as phase:
+            counts = index.index_markets(full=full, resume=False)
+        row = {
+            "seconds": round(phase.wall, 2),
+            "markets_per_second": round(len(fixtures.markets) / phase.wall, 1),
+            "counts": counts,
+            "upstream": phase.upstream,
+            "throttled": phase.throttled,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        results["index"][label] = row
+        print(
+            f"{label:<22} {row['seconds']:>7} s  {row['markets_per_second']:>8} "
+            f"markets/s  {sum(phase.upstream.values()):>5} upstream  "
+            f"{row['peak_rss_mb']['self'] or '-':>7} MB  {counts}"
+        )
+
+    import server
+
+    logging.getLogger().setLevel(logging.WARNING)
+    print(header)
+    cids = [m["condition_id"] for m in fixtures.markets]
+    cids = random.Random(args.seed).sample(cids, min(args.sample, len(cids)))
+    words = sorted({w for m in fixtures.markets for w in m["question"].split()[1:4]})
+    selected = scenarios(cids, words)
+    for name in args.tools or list(selected):
+        make_args, share = selected[name]
+        calls = max(args.concurrency, int(args.calls * share))
+        with Phase(fake) as phase:
+            latencies, errors = asyncio.run(
+                drive(server.mcp, name, make_args, calls, args.concurrency, args.seed)
+            )
+        row = {
+            **summarize(latencies, phase.wall, errors),
+            "upstream": phase.upstream,
+            "throttled": phase.throttled,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        results["tools"][name] = row
+        _print_row(name, row)
+
+    results["upstream_total"] = dict(fake.requests)
+    results["peak_rss_mb"] = peak_rss_mb()
+    print(f"upstream requests by route: {dict(fake.requests)}")
+    print(f"throttled (429):            {fake.throttled}")
+    print(f"peak RSS (MB):              {results['peak_rss_mb']}")
+    fake.stop()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--fixtures", help="directory from `fake_clob.py record`")
+    parser.add_argument("--markets", type=int, default=300, help="synthetic markets")
+    parser.add_argument("--sample", type=int, default=20, help="markets tools touch")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=40, help="calls per tool")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds")
+    parser.add_argument("--rate", type=float, default=0, help="req/s (0 = no limit)")
+    parser.add_argument("--burst", type=float, default=50)
+    parser.add_argument("--ws-rate", type=float, default=200, help="ws messages/s")
+    parser.add_argument("--tools", nargs="*", help="only these tools")
+    parser.add_argument("--skip-index", action="store_true")
+    parser.add_argument("--workdir", help="reuse an index (with --skip-index)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+benchmarks/orderbook_mirror.py — Fake CLOB market websocket and mirror benchmark
+
+Usage:
+  python benchmarks/orderbook_mirror.py                      # run the benchmark
+  python benchmarks/orderbook_mirror.py --replay deltas.jsonl
+  python benchmarks/orderbook_mirror.py serve --port 8766    # fake server only
+  python benchmarks/orderbook_mirror.py record --assets <token_id> ... \\
+      --seconds 60 --out deltas.jsonl                        # record real traffic
+
+The fake server speaks the CLOB market channel: after a subscription it sends
+a "book" snapshot per asset, then "price_change" events, either replayed from
+a recording (one raw message per line; a reconnection resumes where the last
+connection stopped, and the connection idles once it runs out) or generated
+as a random walk. It drops the connection every `--drop-every` messages so the mirror's
+reconnect path is exercised too. With `--gap`, reconnections get no fresh
+snapshots, as if updates were lost, so the mirror has to reload books from
+the REST `/book` endpoint, which the fake also serves.
+
+`run` mirrors the fake feed with `book_mirror.BookMirror`, checks the mirrored
+books against the server's own books, and reports the apply rate and the
+latency of reading a book from the mirror; it exits non-zero if any
+mirrored book differs.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import statistics
+from typing import Any, Dict, Iterator, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from orderbook import OrderBook  # noqa: E402
+
+DEFAULT_ASSETS = [f"fake-token-{i}" for i in range(4)]
+
+
+# ─── Fake server ───────────────────────────────────────────────────────────
+def _snapshot(asset: str, rng: random.Random) -> Dict[str, Any]:
+    mid = rng.randint(20, 80)
+    return {
+        "event_type": "book",
+        "asset_id": asset,
+        "timestamp": str(int(time.time() * 1000)),
+        "bids": [
+            {"price": f"{(mid - i) / 100:.2f}", "size": str(rng.randint(1, 500))}
+            for i in range(1, 20)
+        ],
+        "asks": [
+            {"price": f"{(mid + i) / 100:.2f}", "size": str(rng.randint(1, 500))}
+            for i in range(1, 20)
+        ],
+    }
+
+
+def _random_changes(assets: List[str], rng: random.Random):
+    while True:
+        asset = rng.choice(assets)
+        side = rng.choice(["BUY", "SELL"])
+        price = rng.randint(1, 99)
+        size = 0 if rng.random() < 0.2 else rng.randint(1, 500)
+        yield {
+            "event_type": "price_change",
+            "market": "0xfake",
+            "timestamp": str(int(time.time() * 1000)),
+            "price_changes": [
+                {
+                    "asset_id": asset,
+                    "price": f"{price / 100:.2f}",
+                    "size": str(size),
+                    "side": side,
+                }
+            ],
+        }
+
+
+class FakeMarketChannel:
+    """
+    Serves the market channel and keeps the authoritative books it streams.
+    """
+
+    def __init__(
+        self,
+        replay: Optional[str] = None,
+        drop_every: int = 0,
+        rate: float = 0,
+        seed: int = 0,
+        resnapshot: bool = True,
+    ) -> None:
+        self.replay = replay
+        self.drop_every = drop_every
+        self.rate = rate
+        self.rng = random.Random(seed)
+        # False: reconnections get no "book" snapshots for known assets
+        self.resnapshot = resnapshot
+        self.lock = threading.Lock()
+        self.books: Dict[str, OrderBook] = {}
+        self._recording: Optional[Iterator[Dict[str, Any]]] = None
+        self.sent = 0
+        self.connections = 0
+        self.paused = False
+        self.replayed = False  # the whole recording has been streamed
+
+    def rest_book(self, asset: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            book = self.books.get(asset)
+            return None if book is None else book.to_dict()
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        with self.lock:
+            self._apply_locked(event)
+
+    def _apply_locked(self, event: Dict[str, Any]) -> None:
+        if event.get("event_type") == "book":
+            self.books.setdefault(event["asset_id"], OrderBook(event["asset_id"]))
+            self.books[event["asset_id"]].load(event)
+        elif event.get("event_type") == "price_change":
+            ts = int(event["timestamp"])
+            for ch in event.get("price_changes") or event.get("changes") or []:
+                book = self.books.get(ch.get("asset_id") or event.get("asset_id"))
+                if book is not None:
+                    book.apply(ch["side"], ch["price"], ch["size"], ts)
+
+    def _events(self, assets: List[str]) -> Iterator[Dict[str, Any]]:
+        if not self.replay:
+            return _random_changes(assets, self.rng)
+        if self._recording is None:  # one cursor, shared by every connection
+            self._recording = _read_recording(self.replay)
+        return self._recording
+
+    async def handler(self, ws) -> None:
+        from websockets.exceptions import ConnectionClosed
+
+        try:
+            await self._stream(ws)
+        except ConnectionClosed:
+            pass  # the client resubscribed or went away
+
+    async def _stream(self, ws) -> None:
+        self.connections += 1
+        sub = json.loads(await ws.recv())
+        assets = sub.get("assets_ids") or DEFAULT_ASSETS
+        for asset in assets:
+            book = self.rest_book(asset)
+            if book is not None and not self.resnapshot:
+                continue
+            event = (
+                _snapshot(asset, self.rng)
+                if book is None
+                else {"event_type": "book", **book}
+            )
+            self._apply(event)
+            await ws.send(json.dumps([event]))
+        sent_here = 0
+        for event in self._events(assets):
+            while self.paused:
+                await asyncio.sleep(0.01)
+            self._apply(event)
+            await ws.send(json.dumps(event))
+            self.sent += 1
+            sent_here += 1
+            if self.drop_every and sent_here >= self.drop_every:
+                await ws.close()
+                return
+            await asyncio.sleep(1 / self.rate if self.rate else 0)
+        self.replayed = True
+        await ws.wait_closed()  # the recording ran out: an idle market
+
+
+def _read_recording(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield from _as_list(json.loads(line))
+
+
+def _as_list(value: Any) -> List[Dict[str, Any]]:
+    return value if isinstance(value, list) else [value]
+
+
+def start_server(channel: FakeMarketChannel, port: int) -> None:
+    """
+    Run the fake server on a daemon thread.
+    """
+    from websockets.asyncio.server import serve
+
+    ready = threading.Event()
+
+    async def main():
+        async with serve(channel.handler, "127.0.0.1", port):
+            ready.set()
+            await asyncio.Future()
+
+    threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+    ready.wait()
+
+
+def start_rest_server(channel: FakeMarketChannel, port: int = 0) -> str:
+    """
+    Serve the channel's books at REST `/book` on a daemon thread; returns
+    the URL to use as `CLOB_HOST`.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            token = parse_qs(url.query).get("token_id", [""])[0]
+            book = channel.rest_book(token) if url.path == "/book" else None
+            body = json.dumps(book or {"error": "not found"}).encode()
+            self.send_response(200 if book else 404)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ─── Recorder ──────────────────────────────────────────────────────────────
+async def record(url: str, assets: List[str], seconds: float, out: str) -> None:
+    from websockets.asyncio.client import connect
+
+    deadline = time.monotonic() + seconds
+    n = 0
+    async with connect(url) as ws:
+        await ws.send(json.dumps({"assets_ids": assets, "type": "market"}))
+        with open(out, "w") as f:
+            while time.monotonic() < deadline:
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), deadline - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+                if raw != "PONG":
+                    f.write(raw + "\n")
+                    n += 1
+    print(f"Recorded {n} messages to {out}")
+
+
+# ─── Benchmark ─────────────────────────────────────────────────────────────
+def run(args) -> None:
+    channel = FakeMarketChannel(
+        args.replay, args.drop_every, args.rate, resnapshot=not args.gap
+    )
+    start_server(channel, args.port)
+    os.environ["CLOB_HOST"] = start_rest_server(channel)
+    os.environ.setdefault("ORDERBOOK_SNAPSHOT_GRACE", "0.5")
+    import book_mirror
+    from book_mirror import BookMirror
+
+    assets = args.assets or DEFAULT_ASSETS
+    mirror = BookMirror(url=f"ws://127.0.0.1:{args.port}")
+    t0 = time.perf_counter()
+    mirror.subscribe(assets)
+    while not all(mirror.book(a) for a in assets):
+        time.sleep(0.001)
+    t_ready = time.perf_counter() - t0
+
+    time.sleep(args.seconds)
+
+    reads = []
+    for _ in range(1000):
+        t = time.perf_counter()
+        mirror.book(assets[0])
+        reads.append(time.perf_counter() - t)
+
+    # Quiesce the feed and compare the mirror with the server's books.
+    channel.paused = True
+    time.sleep(book_mirror.SNAPSHOT_GRACE + 0.2)  # room for REST resyncs
+    mismatched = [a for a in assets if not in_sync(mirror, channel, a)]
+    stats = mirror.stats()
+
+    print(f"time to first books:   {t_ready * 1000:.1f} ms")
+    print(f"messages / updates:    {stats['messages']} / {stats['updates']}")
+    print(f"update rate:           {stats['updates'] / args.seconds:,.0f} /s")
+    print(f"reconnects / resyncs:  {stats['reconnects']} / {stats['resyncs']}")
+    print(f"resubscriptions:       {stats['resubscriptions']}")
+    print(
+        f"book read p50 / p99:   {statistics.median(reads) * 1e6:.1f} / "
+        f"{sorted(reads)[int(len(reads) * 0.99)] * 1e6:.1f} µs"
+    )
+    print(f"books out of sync:     {len(mismatched)}")
+    if mismatched:
+        sys.exit(1)
+
+
+def in_sync(mirror, channel: FakeMarketChannel, asset: str) -> bool:
+    """
+    Whether the mirror's book for `asset` has the server's levels.
+    """
+    mirrored, served = mirror.book(asset), channel.rest_book(asset)
+    return (
+        mirrored is not None
+        and served is not None
+        and all(mirrored[k] == served[k] for k in ("bids", "asks"))
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument(
+        "command", nargs="?", default="run", choices=["run", "serve", "record"]
+    )
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--replay", help="JSONL of recorded market-channel messages")
+    parser.add_argument("--drop-every", type=int, default=5000)
+    parser.add_argument("--gap", action="store_true", help="no snapshots on reconnect")
+    parser.add_argument(
+        "--rate", type=float, default=0, help="messages/s (0 = unthrottled)"
+    )
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--assets", nargs="*")
+    parser.add_argument(
+        "--url", default="wss://ws-subscriptions-clob.polymarket.com/ws/market"
+    )
+    parser.add_argument("--out", default="deltas.jsonl")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        channel = FakeMarketChannel(
+            args.replay, args.drop_every, args.rate, resnapshot=not args.gap
+        )
+        start_server(channel, args.port)
+        print(f"Fake market channel on ws://127.0.0.1:{args.port}")
+        print(f"Its books over REST at {start_rest_server(channel)}/book")
+        threading.Event().wait()
+    elif args.command == "record":
+        asyncio.run(record(args.url, args.assets or [], args.seconds, args.out))
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+benchmarks/startup.py — Measure server import time and time to first tool response
+
+Usage:
+  python benchmarks/startup.py
+  python benchmarks/startup.py --runs 5 --tool list_prediction_market_graph \\
+      --args '{"condition_id": "0x..."}'
+
+The default tool call (`list_prediction_market_orderbooks` with no ids) needs
+neither the network nor the embedding model, so it isolates startup cost.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+import subprocess
+from typing import Any, Dict, List
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import() -> float:
+    """
+    Seconds spent importing `server` in a fresh interpreter.
+    """
+    code = (
+        "import time; t = time.perf_counter(); import server; "
+        "print(time.perf_counter() - t)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "WARMUP": "0"},
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+async def measure_first_response(tool: str, args: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Spawn the stdio server and time the handshake and the first tool call.
+    """
+    params = StdioServerParameters(
+        command=sys.executable, args=[os.path.join(ROOT, "server.py")], cwd=ROOT
+    )
+    t0 = time.perf_counter()
+    async with stdio_client(params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            t_init = time.perf_counter()
+            await session.list_tools()
+            t_list = time.perf_counter()
+            await session.call_tool(tool, args)
+            t_call = time.perf_counter()
+    return {
+        "initialize": t_init - t0,
+        "list_tools": t_list - t_init,
+        "first_call": t_call - t_list,
+        "to_first_response": t_call - t0,
+    }
+
+
+def _summary(samples: List[float]) -> str:
+    return (
+        f"median {statistics.median(samples) * 1000:8.1f} ms   "
+        f"min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--tool", default="list_prediction_market_orderbooks")
+    parser.add_argument("--args", default='{"condition_ids": []}')
+    opts = parser.parse_args()
+
+    imports = [measure_import() for _ in range(opts.runs)]
+    print(f"import server          {_summary(imports)}")
+
+    phases: Dict[str, List[float]] = {}
+    for _ in range(opts.runs):
+        result = asyncio.run(measure_first_response(opts.tool, json.loads(opts.args)))
+        for k, v in result.items():
+            phases.setdefault(k, []).append(v)
+    for k, samples in phases.items():
+        print(f"{k:<22} {_summary(samples)}")
+
+
+if __name__ == "__main__":
+    main()
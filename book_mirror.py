@@ -0,0 +1,233 @@
+"""
+book_mirror.py — Live order books mirrored from the CLOB market websocket
+
+Subscribed tokens get an in-memory L2 book (`orderbook.OrderBook`) that the
+CLOB market channel keeps current: "book" events replace it, "price_change"
+events update single levels. The mirror runs its own event loop on a daemon
+thread, so tools read books without any I/O.
+
+Updates carry no sequence numbers, so gaps are handled conservatively: every
+(re)connect invalidates all books until a fresh snapshot arrives, and a book
+still without one shortly after subscribing is loaded from the REST `/book`
+endpoint. Until then readers get None and fall back to REST themselves.
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import upstream
+from orderbook import OrderBook
+
+LOGGER = logging.getLogger(__name__)
+
+WS_URL = os.getenv(
+    "CLOB_WS_URL", "wss://ws-subscriptions-clob.polymarket.com/ws/market"
+)
+# The market channel expects an application-level "PING" at this cadence.
+PING_INTERVAL = float(os.getenv("ORDERBOOK_WS_PING_INTERVAL", "10"))
+# Seconds to wait for websocket snapshots before loading a book over REST.
+SNAPSHOT_GRACE = float(os.getenv("ORDERBOOK_SNAPSHOT_GRACE", "2"))
+
+
+class BookMirror:
+    """
+    Websocket-maintained books for a changing set of subscribed tokens.
+    """
+
+    def __init__(self, url: str = WS_URL) -> None:
+        self.url = url
+        self._lock = threading.Lock()
+        self._tokens: Set[str] = set()
+        self._books: Dict[str, OrderBook] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self.messages = 0
+        self.updates = 0
+        self.reconnects = 0
+        self.resubscriptions = 0
+        self.resyncs = 0
+
+    # ─── Public API (any thread) ───────────────────────────────────────────
+    def subscribe(self, token_ids: Iterable[str]) -> None:
+        with self._lock:
+            new = set(token_ids) - self._tokens
+            self._tokens |= new
+            for tid in new:
+                self._books[tid] = OrderBook(tid)
+        if new:
+            self._ensure_running()
+            self._signal()
+
+    def unsubscribe(self, token_ids: Iterable[str]) -> None:
+        with self._lock:
+            gone = set(token_ids) & self._tokens
+            self._tokens -= gone
+            for tid in gone:
+                self._books.pop(tid, None)
+        if gone:
+            self._signal()
+
+    def subscribed(self) -> List[str]:
+        with self._lock:
+            return sorted(self._tokens)
+
+    def book(self, token_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Current book in REST `/book` shape, or None if not mirrored (yet).
+        """
+        with self._lock:
+            book = self._books.get(token_id)
+            if book is None or not book.ready:
+                return None
+            return book.to_dict()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ready = sum(1 for b in self._books.values() if b.ready)
+        return {
+            "subscribed": len(self._tokens),
+            "ready": ready,
+            "messages": self.messages,
+            "updates": self.updates,
+            "reconnects": self.reconnects,
+            "resubscriptions": self.resubscriptions,
+            "resyncs": self.resyncs,
+        }
+
+    def _ensure_running(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=lambda: asyncio.run(self._main()),
+                    name="book-mirror",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _signal(self) -> None:
+        loop, changed = self._loop, self._changed
+        if loop is not None and changed is not None:
+            loop.call_soon_threadsafe(changed.set)
+
+    # ─── Mirror loop ───────────────────────────────────────────────────────
+    async def _main(self) -> None:
+        from websockets.asyncio.client import connect
+
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        attempt = 0
+        while True:
+            self._changed.clear()
+            tokens = self.subscribed()
+            if not tokens:
+                await self._changed.wait()
+                continue
+            tasks: List[asyncio.Task] = []
+            try:
+                async with connect(self.url, ping_interval=None) as ws:
+                    await ws.send(json.dumps({"assets_ids": tokens, "type": "market"}))
+                    tasks = [
+                        asyncio.create_task(self._keepalive(ws)),
+                        asyncio.create_task(self._close_on_change(ws)),
+                        asyncio.create_task(self._resync_missing(tokens)),
+                    ]
+                    async for raw in ws:
+                        # backoff resets once the server actually streams
+                        attempt = 0
+                        self._handle(raw)
+                reason = "closed by the server"
+            except Exception as e:
+                reason = f"failed ({e})"
+            finally:
+                for task in tasks:
+                    task.cancel()
+                self._invalidate()
+            if self._changed.is_set():  # closed by `_close_on_change`
+                self.resubscriptions += 1
+                continue
+            # Any other close backs off, so a server that keeps dropping the
+            # connection cannot drive a hot reconnect loop.
+            delay = upstream._retry_delay(attempt)
+            attempt += 1
+            LOGGER.warning(
+                "Orderbook websocket %s; reconnecting in %.2fs", reason, delay
+            )
+            await asyncio.sleep(delay)
+            self.reconnects += 1
+
+    async def _keepalive(self, ws) -> None:
+        try:
+            while True:
+                await asyncio.sleep(PING_INTERVAL)
+                await ws.send("PING")
+        except Exception:
+            return  # connection closed; the main loop reconnects
+
+    async def _close_on_change(self, ws) -> None:
+        # A new subscription set needs a new connection (and new snapshots).
+        await self._changed.wait()
+        await ws.close()
+
+    async def _resync_missing(self, tokens: List[str]) -> None:
+        await asyncio.sleep(SNAPSHOT_GRACE)
+        for tid in tokens:
+            with self._lock:
+                book = self._books.get(tid)
+                if book is None or book.ready:
+                    continue
+            try:
+                snapshot = await asyncio.to_thread(
+                    upstream.get_json, "/book", {"token_id": tid}
+                )
+            except Exception as e:
+                LOGGER.warning("REST resync of book %s failed: %s", tid, e)
+                continue
+            with self._lock:
+                book = self._books.get(tid)
+                if book is not None and not book.ready:
+                    book.load(snapshot)
+                    self.resyncs += 1
+
+    def _invalidate(self) -> None:
+        # Updates sent while disconnected are lost: wait for fresh snapshots.
+        with self._lock:
+            for book in self._books.values():
+                book.ready = False
+
+    def _handle(self, raw: Any) -> None:
+        self.messages += 1
+        if raw == "PONG":
+            return
+        try:
+            events = json.loads(raw)
+        except ValueError:
+            return
+        if isinstance(events, dict):
+            events = [events]
+        with self._lock:
+            for ev in events:
+                kind = ev.get("event_type")
+                if kind == "book":
+                    book = self._books.get(ev.get("asset_id"))
+                    if book is not None:
+                        book.load(ev)
+                elif kind == "price_change":
+                    self._apply_changes(ev)
+
+    def _apply_changes(self, ev: Dict[str, Any]) -> None:
+        timestamp = int(ev.get("timestamp") or time.time() * 1000)
+        # Current payloads list changes under "price_changes" with an asset_id
+        # each; older ones used "changes" with one asset_id for the event.
+        changes = ev.get("price_changes") or ev.get("changes") or []
+        for ch in changes:
+            book = self._books.get(ch.get("asset_id") or ev.get("asset_id"))
+            if book is None or not book.ready:
+                continue
+            if book.apply(ch["side"], ch["price"], ch["size"], timestamp):
+                self.updates += 1
@@ -0,0 +1,177 @@
+"""
+cache.py — Small in-process caches shared by the MCP tools
+"""
+
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class TTLCache:
+    """
+    Bounded LRU mapping whose entries expire `ttl` seconds after insertion.
+
+    Reads refresh an entry's LRU position but not its expiry. Once `maxsize`
+    entries are stored, the least recently used one is evicted.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires, value = item
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+        }
+
+
+class MarketCache:
+    """
+    Process-wide cache of CLOB market payloads, keyed by condition_id.
+
+    Full payloads carry live token prices and expire after `price_ttl`
+    seconds. The static part of a market (question and token_id → outcome
+    mapping) never changes once listed, so it is kept for `static_ttl` seconds
+    and can be seeded from the metadata `index.py` stores in Chroma. Seeds go
+    to a cache of their own, so a deep search cannot flush the views of the
+    markets actually being fetched.
+    """
+
+    def __init__(
+        self, maxsize: int = 2048, price_ttl: float = 15.0, static_ttl: float = 86400.0
+    ) -> None:
+        self.markets = TTLCache(maxsize=maxsize, ttl=price_ttl)
+        self.static = TTLCache(maxsize=maxsize, ttl=static_ttl)
+        self.seeded = TTLCache(maxsize=maxsize, ttl=static_ttl)
+
+    @staticmethod
+    def _static_view(condition_id: str, question: str, tokens: Any) -> Dict[str, Any]:
+        return {
+            "condition_id": condition_id,
+            "question": question or "",
+            "tokens": [
+                {"token_id": tok["token_id"], "outcome": tok["outcome"]}
+                for tok in tokens
+                if tok.get("token_id") and tok.get("outcome") is not None
+            ],
+        }
+
+    def get(self, condition_id: str) -> Optional[Dict[str, Any]]:
+        """Full market payload, including prices, if still fresh."""
+        return self.markets.get(condition_id)
+
+    def get_static(self, condition_id: str) -> Optional[Dict[str, Any]]:
+        """Question and token mapping only; survives price expiry."""
+        static = self.static.get(condition_id)
+        if static is None:
+            # evicted while the full payload is still fresh: rebuild it
+            market = self.markets.get(condition_id)
+            if market is not None:
+                static = self.put_static(market, condition_id)
+        if static is None:
+            static = self.seeded.get(condition_id)
+        return static
+
+    def put(self, market: Dict[str, Any], condition_id: Optional[str] = None) -> None:
+        cid = condition_id or market.get("condition_id")
+        if not cid:
+            return
+        self.markets.set(cid, market)
+        self.put_static(market, cid)
+
+    def put_static(self, market: Dict[str, Any], condition_id: str) -> Dict[str, Any]:
+        """
+        Cache (and return) the static view of a full market payload.
+        """
+        static = self._static_view(
+            condition_id, market.get("question"), market.get("tokens", [])
+        )
+        self.static.set(condition_id, static)
+        return static
+
+    def seed(self, condition_id: str, meta: Dict[str, Any]) -> None:
+        """
+        Seed the static view from a Chroma metadata record.
+
+        `tokens` is stored by `index.py` as a JSON string; prices in it are
+        as old as the index, so only the token mapping is kept.
+        """
+        raw_tokens = meta.get("tokens", [])
+        if isinstance(raw_tokens, str):
+            try:
+                raw_tokens = json.loads(raw_tokens)
+            except json.JSONDecodeError:
+                return
+        if not raw_tokens:
+            return
+        self.seeded.set(
+            condition_id,
+            self._static_view(condition_id, meta.get("question"), raw_tokens),
+        )
+
+    def seed_tokens(
+        self,
+        condition_id: str,
+        question: str,
+        token_ids: List[str],
+        outcomes: List[str],
+    ) -> None:
+        """
+        Seed the static view from a market-store record.
+        """
+        tokens = [{"token_id": t, "outcome": o} for t, o in zip(token_ids, outcomes)]
+        if tokens:
+            self.seeded.set(
+                condition_id, self._static_view(condition_id, question, tokens)
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "markets": self.markets.stats(),
+            "static": self.static.stats(),
+            "seeded": self.seeded.stats(),
+        }
@@ -3,14 +3,19 @@ import sys
 import json
 import asyncio
 import getpass
+from contextlib import asynccontextmanager
 from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
 from langchain_mcp_adapters.tools import load_mcp_tools
 from langgraph.prebuilt import create_react_agent
 from langchain_groq import ChatGroq
 from rich.console import Console
 from rich.markdown import Markdown
 
+from agent_context import ContextBudget, ToolMemo
+
 # Initialize Rich console
 console = Console()
 
@@ -21,11 +26,33 @@ if "GROQ_API_KEY" not in os.environ:
 # Instantiate the ChatGroq model
 model = ChatGroq(model="qwen-qwq-32b")
 
+# URL of a shared server (`python server.py --transport streamable-http`),
+# e.g. http://127.0.0.1:8000/mcp, or .../sse for the SSE transport. Without
+# one, a private server is started over stdio.
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL")
+
 server_params = StdioServerParameters(
-    command="python",
-    args=["main.py"],
+    command=sys.executable,
+    args=[os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")],
 )
 
+
+@asynccontextmanager
+async def connect():
+    """
+    (read, write) streams to the MCP server.
+    """
+    if not MCP_SERVER_URL:
+        async with stdio_client(server_params) as (read, write):
+            yield read, write
+    elif MCP_SERVER_URL.rstrip("/").endswith("/sse"):
+        async with sse_client(MCP_SERVER_URL) as (read, write):
+            yield read, write
+    else:
+        async with streamablehttp_client(MCP_SERVER_URL) as (read, write, _):
+            yield read, write
+
+
 SYSTEM_PROMPT = """You are a Finance AI Agent connected to an external system through the Model Context Protocol (MCP). You specialize in analyzing an investor’s portfolio in the context of ongoing events listed on Polymarket prediction markets. You are capable of retrieving real-time and historical data, applying forecasting models, and generating context-rich insights.
 
 Your goal is to provide structured, explainable insights on:
@@ -156,17 +183,23 @@ def get_multiline_input(
 
 
 async def interactive_chat():
-    async with stdio_client(server_params) as (read, write):
+    async with connect() as (read, write):
         async with ClientSession(read, write) as session:
             await session.initialize()
             console.print("[bold green]MCP Session Initialized.[/bold green]\n")
 
-            tools = await load_mcp_tools(session)
+            # Identical tool calls within a TTL are answered from a local memo
+            memo = ToolMemo()
+            tools = memo.wrap(await load_mcp_tools(session))
             console.print(
                 f"[bold green]Loaded Tools:[/bold green] {[tool.name for tool in tools]}\n"
             )
 
-            agent = create_react_agent(model, tools)
+            # Keep the context sent to the model within a token budget
+            budget = ContextBudget()
+            agent = create_react_agent(
+                model, tools, pre_model_hook=budget.pre_model_hook
+            )
             console.print("[bold green]ReAct Agent Created.[/bold green]\n")
 
             chat_history = [("system", SYSTEM_PROMPT)]
@@ -185,7 +218,9 @@ async def interactive_chat():
                 chat_history.append(("human", user_input))
 
                 try:
-                    response = await agent.ainvoke({"messages": chat_history})
+                    response = await agent.ainvoke(
+                        {"messages": budget.compact(chat_history)}
+                    )
                 except Exception as e:
                     console.print(f"[bold red]Agent invocation error:[/bold red] {e}")
                     continue
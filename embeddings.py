@@ -0,0 +1,178 @@
+"""
+embeddings.py — Batched, multi-process sentence embeddings with an on-disk cache
+
+Used by `index.py` to compute document vectors itself instead of letting
+Chroma embed inside `collection.upsert`. Vectors are cached on disk keyed by
+(model name, text hash), so a text is never embedded twice for the same model.
+"""
+
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+LOGGER = logging.getLogger(__name__)
+
+MODEL_NAME = os.getenv("EMBEDDING_MODEL", "all-mpnet-base-v2")
+BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+WORKERS = int(os.getenv("EMBEDDING_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ─── On-disk cache ─────────────────────────────────────────────────────────
+class EmbeddingCache:
+    """
+    SQLite-backed store of float32 vectors keyed by (model, text hash).
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i : i + 500]
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings WHERE model = ?"
+                    f" AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [model, *chunk],
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector)"
+                " VALUES (?, ?, ?)",
+                [
+                    (model, h, np.asarray(v, dtype=np.float32).tobytes())
+                    for h, v in vectors.items()
+                ],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ─── Worker side ───────────────────────────────────────────────────────────
+_worker_ef = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_ef
+    try:
+        import torch
+
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_ef = _load(model_name)
+
+
+def _load(model_name: str):
+    # Same encoder (and settings) Chroma uses for queries against the collection
+    from chromadb.utils import embedding_functions
+
+    return embedding_functions.SentenceTransformerEmbeddingFunction(
+        model_name=model_name
+    )
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_ef(texts), dtype=np.float32)
+
+
+# ─── Embedder ──────────────────────────────────────────────────────────────
+class Embedder:
+    """
+    Embed texts in batches of `batch_size`, spread over `workers` processes.
+
+    Cached vectors are returned without touching the model; only missing
+    (and de-duplicated) texts are encoded. With `workers <= 1` the model runs
+    in-process.
+    """
+
+    def __init__(
+        self,
+        cache_path: str,
+        model_name: str = MODEL_NAME,
+        batch_size: int = BATCH_SIZE,
+        workers: int = WORKERS,
+    ) -> None:
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.workers = workers
+        self.cache = EmbeddingCache(cache_path)
+        self.computed = 0
+        self.cached = 0
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._local = None
+
+    def _encode_batches(self, texts: List[str]) -> List[np.ndarray]:
+        batches = [
+            texts[i : i + self.batch_size]
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        if self.workers <= 1:
+            if self._local is None:
+                self._local = _load(self.model_name)
+            return [np.asarray(self._local(b), dtype=np.float32) for b in batches]
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                # spawn: the indexer runs threads, which fork does not mix with
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, threads),
+            )
+        return list(self._pool.map(_encode, batches))
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(t) for t in texts]
+        vectors = self.cache.get_many(self.model_name, list(set(hashes)))
+
+        missing: Dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h in vectors:
+                self.cached += 1
+            else:
+                missing.setdefault(h, t)
+
+        if missing:
+            encoded = np.concatenate(self._encode_batches(list(missing.values())))
+            fresh = dict(zip(missing.keys(), encoded))
+            self.cache.put_many(self.model_name, fresh)
+            vectors.update(fresh)
+            self.computed += len(fresh)
+
+        return [vectors[h].tolist() for h in hashes]
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self.cache.close()
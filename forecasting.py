@@ -0,0 +1,300 @@
+"""
+forecasting.py — ARIMA model selection and forecasting for price series
+
+The (p, d, q) candidates of a series are fitted in parallel on a process pool.
+Workers only send back the AIC and the estimated parameters; the winner is
+rebuilt in-process by filtering with those parameters (no second estimation)
+and cached by (condition_id, last observation timestamp), so forecasting an
+unchanged series again costs nothing. `fitted_models()` spreads many markets
+over the same pool, one market per task.
+
+pandas and statsmodels are imported inside the functions: they are slow to
+import and only needed once a forecast is requested.
+"""
+
+import os
+import sys
+import time
+import types
+import logging
+import warnings
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cache import TTLCache
+
+LOGGER = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("FORECAST_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+MIN_OBSERVATIONS = 10
+ORDERS = [(p, d, q) for p in range(2) for d in range(2) for q in range(2)]
+DEFAULT_ORDER = (1, 1, 1)
+
+# Keyed on (condition_id, last observation timestamp, selection)
+MODEL_CACHE = TTLCache(
+    maxsize=int(os.getenv("FORECAST_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("FORECAST_CACHE_TTL", "86400")),
+)
+
+
+# ─── Series Preparation ────────────────────────────────────────────────────
+def daily_series(timestamps: np.ndarray, prices: np.ndarray):
+    """
+    Last price per day, forward-filled, as a pandas Series with daily freq.
+    """
+    import pandas as pd
+
+    series = pd.Series(prices, index=pd.to_datetime(timestamps, unit="s"))
+    return series.dropna().resample("D").last().ffill()
+
+
+# ─── Worker side ───────────────────────────────────────────────────────────
+def _init_worker() -> None:
+    from statsmodels.tsa.arima.model import ARIMA  # noqa: F401
+
+
+def _fit(series, order: Tuple[int, int, int]) -> Optional[Tuple[float, np.ndarray]]:
+    """
+    (AIC, estimated parameters) of one candidate; None if the fit fails.
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            res = ARIMA(series, order=order).fit()
+        return float(res.aic), np.asarray(res.params)
+    except Exception:
+        return None
+
+
+def _select_series(
+    timestamps: np.ndarray, prices: np.ndarray, selection: str
+) -> Optional[Tuple[Any, Tuple[int, int, int], Optional[np.ndarray], float]]:
+    """
+    Resample one market and fit its candidates one after another; used to
+    spread many markets over the pool. Returns (daily series, order, params,
+    seconds) or None with too little data.
+    """
+    t0 = time.perf_counter()
+    series = daily_series(timestamps, prices)
+    if len(series) < MIN_OBSERVATIONS:
+        return None
+    orders = candidate_orders(series, selection)
+    scored = [
+        (fit[0], o, fit[1])
+        for o, fit in ((o, _fit(series, o)) for o in orders)
+        if fit is not None
+    ]
+    if not scored:
+        return series, DEFAULT_ORDER, None, time.perf_counter() - t0
+    _, order, params = min(scored, key=lambda s: s[0])
+    return series, order, params, time.perf_counter() - t0
+
+
+def _noop(_: int) -> None:
+    return None
+
+
+# ─── Model Selection ───────────────────────────────────────────────────────
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_spawn_lock = threading.Lock()
+
+
+class _SpawnProcess(multiprocessing.context.SpawnProcess):
+    """
+    A spawned worker that does not re-run the parent's `__main__`.
+
+    Spawn re-imports the launching script (`server.py`) in every child as
+    `__mp_main__`; a worker only needs this module, which it imports when it
+    unpickles `_init_worker`. The parent's main module is hidden while the
+    child's start-up data is written.
+    """
+
+    @staticmethod
+    def _Popen(process_obj):
+        with _spawn_lock:
+            main = sys.modules["__main__"]
+            sys.modules["__main__"] = types.ModuleType("__main__")
+            try:
+                return multiprocessing.context.SpawnProcess._Popen(process_obj)
+            finally:
+                sys.modules["__main__"] = main
+
+
+class _SpawnContext(multiprocessing.context.SpawnContext):
+    Process = _SpawnProcess
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if WORKERS <= 1:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(
+                    max_workers=WORKERS,
+                    # spawn: the server runs threads, which fork does not mix with
+                    mp_context=_SpawnContext(),
+                    initializer=_init_worker,
+                )
+    return _pool
+
+
+def warm_up() -> None:
+    """
+    Start the worker processes (and their statsmodels import) ahead of use.
+    """
+    pool = _get_pool()
+    if pool is not None:
+        list(pool.map(_noop, range(WORKERS)))
+
+
+def _differencing_order(series) -> int:
+    """
+    d = 0 if an augmented Dickey-Fuller test rejects a unit root, else 1.
+    """
+    from statsmodels.tsa.stattools import adfuller
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return 0 if adfuller(series.values, autolag="AIC")[1] < 0.05 else 1
+    except Exception:
+        return 1
+
+
+def candidate_orders(series, selection: str = "aic") -> List[Tuple[int, int, int]]:
+    """
+    "aic" tries every (p, d, q) in ORDERS; "fast" fixes d with a stationarity
+    test first, halving the number of fits.
+    """
+    if selection == "fast":
+        d = _differencing_order(series)
+        return [o for o in ORDERS if o[1] == d]
+    return list(ORDERS)
+
+
+def select_model(series, selection: str = "aic"):
+    """
+    Fit the candidate orders (in parallel when a pool is configured) and
+    return the lowest-AIC model as a statsmodels results object.
+    """
+    orders = candidate_orders(series, selection)
+    pool = _get_pool()
+    if pool is None:
+        fits = [_fit(series, o) for o in orders]
+    else:
+        fits = list(pool.map(_fit, [series] * len(orders), orders))
+
+    scored = [(fit[0], o, fit[1]) for o, fit in zip(orders, fits) if fit is not None]
+    if not scored:
+        return _build(series, DEFAULT_ORDER, None)
+    _, order, params = min(scored, key=lambda s: s[0])
+    return _build(series, order, params)
+
+
+def _build(series, order: Tuple[int, int, int], params: Optional[np.ndarray]):
+    """
+    Results object for `order`: filtered with known `params`, else estimated.
+    """
+    from statsmodels.tsa.arima.model import ARIMA
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = ARIMA(series, order=order)
+        return model.filter(params) if params is not None else model.fit()
+
+
+def fitted_model(
+    condition_id: str,
+    timestamps: np.ndarray,
+    prices: np.ndarray,
+    selection: str = "aic",
+):
+    """
+    Selected model for a market's series; None with too little data.
+    Cached until a newer observation arrives.
+    """
+    valid = ~np.isnan(prices)
+    if not valid.any():
+        return None
+    key = _cache_key(condition_id, timestamps[valid], selection)
+    model = MODEL_CACHE.get(key)
+    if model is not None:
+        return model
+    series = daily_series(timestamps[valid], prices[valid])
+    if len(series) < MIN_OBSERVATIONS:
+        return None
+    model = select_model(series, selection)
+    MODEL_CACHE.set(key, model)
+    return model
+
+
+def _cache_key(condition_id: str, timestamps: np.ndarray, selection: str):
+    return condition_id, int(timestamps[-1]), selection
+
+
+def fitted_models(
+    series: Dict[str, Tuple[np.ndarray, np.ndarray]], selection: str = "aic"
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Select models for many markets at once ({condition_id: (timestamps,
+    prices)}), one market per pool task. Each result has "model" (None with
+    too little data), "fit_seconds" and, on failure, "error".
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = {}
+    pool = _get_pool()
+    for cid, (timestamps, prices) in series.items():
+        valid = ~np.isnan(prices)
+        if not valid.any():
+            results[cid] = {"model": None, "fit_seconds": 0.0}
+            continue
+        key = _cache_key(cid, timestamps[valid], selection)
+        model = MODEL_CACHE.get(key)
+        if model is not None:
+            results[cid] = {"model": model, "fit_seconds": 0.0}
+            continue
+        args = (timestamps[valid], prices[valid], selection)
+        if pool is None:
+            pending[cid] = (key, None, args)
+        else:
+            pending[cid] = (key, pool.submit(_select_series, *args), args)
+
+    for cid, (key, future, args) in pending.items():
+        try:
+            selected = future.result() if future else _select_series(*args)
+            if selected is None:
+                results[cid] = {"model": None, "fit_seconds": 0.0}
+                continue
+            daily, order, params, seconds = selected
+            model = _build(daily, order, params)
+            MODEL_CACHE.set(key, model)
+            results[cid] = {"model": model, "fit_seconds": round(seconds, 3)}
+        except Exception as e:
+            results[cid] = {"model": None, "fit_seconds": 0.0, "error": str(e)}
+    return results
+
+
+def forecast(model, horizons: Sequence[int]) -> List[Dict[str, Any]]:
+    """
+    Yes/No probabilities at each horizon (days ahead of the last observation).
+    """
+    steps = max(horizons)
+    mean = np.asarray(model.get_forecast(steps=steps).predicted_mean)
+    return [
+        {
+            "horizon_days": days,
+            "yes_probability": round(float(mean[days - 1]), 3),
+            "no_probability": round(1 - float(mean[days - 1]), 3),
+        }
+        for days in horizons
+        if 1 <= days <= len(mean)
+    ]
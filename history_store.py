@@ -0,0 +1,196 @@
+"""
+history_store.py — Local, incrementally synced price-history store
+
+Price histories only grow at the end, so `server.py` keeps every series it
+has fetched in SQLite, keyed by (token_id, fidelity), and only asks the CLOB
+for points after the last stored timestamp. A series covers the history from
+`since` on: it starts with the window first asked for and is backfilled when
+a wider one is. Retention and a cap on the number of stored series keep disk
+usage bounded.
+"""
+
+import os
+import time
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# Empty PRICE_STORE_DIR disables the store; histories are then fetched whole.
+STORE_DIR = os.getenv(
+    "PRICE_STORE_DIR",
+    os.path.join(os.getenv("CHROMA_PERSIST_DIR", ".chroma"), "price_history"),
+)
+RETENTION_DAYS = float(os.getenv("PRICE_STORE_RETENTION_DAYS", "0"))
+MAX_SERIES = int(os.getenv("PRICE_STORE_MAX_SERIES", "1000"))
+COMPACT_INTERVAL = float(os.getenv("PRICE_STORE_COMPACT_INTERVAL", "3600"))
+# A series synced less than this many seconds ago is served without a fetch.
+SYNC_INTERVAL = float(os.getenv("PRICE_STORE_SYNC_INTERVAL", "60"))
+
+
+class PriceHistoryStore:
+    """
+    SQLite store of (t, p) points per (token_id, fidelity) series.
+
+    `retention_days` drops points older than that many days (0 keeps all);
+    `max_series` evicts the least recently read series beyond that count.
+    Both run from `compact()`, at most every `compact_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        directory: str = STORE_DIR,
+        retention_days: float = RETENTION_DAYS,
+        max_series: int = MAX_SERIES,
+        compact_interval: float = COMPACT_INTERVAL,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "history.sqlite3")
+        self.retention_days = retention_days
+        self.max_series = max_series
+        self.compact_interval = compact_interval
+        self._last_compact = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # auto_vacuum only takes effect when set before the first table exists
+        self._conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS points (
+                token_id TEXT NOT NULL,
+                fidelity INTEGER NOT NULL,
+                t INTEGER NOT NULL,
+                p REAL NOT NULL,
+                PRIMARY KEY (token_id, fidelity, t)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS series (
+                token_id TEXT NOT NULL,
+                fidelity INTEGER NOT NULL,
+                last_t INTEGER,
+                since INTEGER NOT NULL DEFAULT 0,
+                synced_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (token_id, fidelity)
+            );
+            """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(series)")]
+        if "since" not in columns:  # stores written before backfilling existed
+            self._conn.execute(
+                "ALTER TABLE series ADD COLUMN since INTEGER NOT NULL DEFAULT 0"
+            )
+        self._conn.commit()
+
+    def state(
+        self, token_id: str, fidelity: int
+    ) -> Tuple[Optional[int], Optional[int], float]:
+        """
+        (start of the stored range, 0 for the whole history; last stored
+        timestamp; wall time of the last sync), or (None, None, 0) if new.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT since, last_t, synced_at FROM series"
+                " WHERE token_id = ? AND fidelity = ?",
+                (token_id, fidelity),
+            ).fetchone()
+        return tuple(row) if row else (None, None, 0.0)
+
+    def append(
+        self,
+        token_id: str,
+        fidelity: int,
+        points: List[Dict[str, Any]],
+        since: Optional[int] = None,
+    ) -> None:
+        """
+        Store `points` ([{"t": ..., "p": ...}]) and mark the series synced.
+        `since` is where the fetched range started (0: the whole history);
+        None for a fetch of the tail, which leaves the stored start as is.
+        """
+        now = time.time()
+        rows = [(token_id, fidelity, int(pt["t"]), float(pt["p"])) for pt in points]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO points (token_id, fidelity, t, p)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.execute(
+                "INSERT INTO series"
+                " (token_id, fidelity, last_t, since, synced_at, accessed_at)"
+                " VALUES (?, ?, (SELECT MAX(t) FROM points WHERE token_id = ?"
+                " AND fidelity = ?), ?, ?, ?)"
+                " ON CONFLICT (token_id, fidelity) DO UPDATE SET"
+                " last_t = COALESCE(excluded.last_t, last_t),"
+                " since = MIN(since, ?),"
+                " synced_at = excluded.synced_at",
+                (
+                    token_id,
+                    fidelity,
+                    token_id,
+                    fidelity,
+                    0 if since is None else since,
+                    now,
+                    now,
+                    2**62 if since is None else since,
+                ),
+            )
+            self._conn.commit()
+        if time.monotonic() - self._last_compact > self.compact_interval:
+            self.compact()
+
+    def read(
+        self,
+        token_id: str,
+        fidelity: int,
+        start_ts: Optional[int] = None,
+        end_ts: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Stored points with `start_ts <= t <= end_ts`, oldest first.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT t, p FROM points WHERE token_id = ? AND fidelity = ?"
+                " AND t >= ? AND t <= ? ORDER BY t",
+                (token_id, fidelity, start_ts or 0, end_ts or 2**62),
+            ).fetchall()
+            self._conn.execute(
+                "UPDATE series SET accessed_at = ? WHERE token_id = ? AND fidelity = ?",
+                (time.time(), token_id, fidelity),
+            )
+            self._conn.commit()
+        return [{"t": t, "p": p} for t, p in rows]
+
+    def compact(self) -> None:
+        """
+        Apply retention and the series cap, then return freed pages to disk.
+        """
+        self._last_compact = time.monotonic()
+        with self._lock:
+            if self.retention_days > 0:
+                cutoff = int(time.time() - self.retention_days * 86400)
+                self._conn.execute("DELETE FROM points WHERE t < ?", (cutoff,))
+            evicted = self._conn.execute(
+                "SELECT token_id, fidelity FROM series"
+                " ORDER BY accessed_at DESC LIMIT -1 OFFSET ?",
+                (self.max_series,),
+            ).fetchall()
+            for token_id, fidelity in evicted:
+                self._conn.execute(
+                    "DELETE FROM points WHERE token_id = ? AND fidelity = ?",
+                    (token_id, fidelity),
+                )
+                self._conn.execute(
+                    "DELETE FROM series WHERE token_id = ? AND fidelity = ?",
+                    (token_id, fidelity),
+                )
+            self._conn.commit()
+            # executescript steps the pragma to completion; execute() would
+            # free a single page
+            self._conn.executescript("PRAGMA incremental_vacuum;")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if evicted:
+            LOGGER.info("Evicted %d price series from the local store", len(evicted))
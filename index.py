@@ -4,19 +4,27 @@ index.py — One-off script to load *all* Polymarket markets into Chroma
 
 Usage:
   # Make sure your .env is populated, then:
-  python index.py
+  python index.py           # incremental: only new/changed markets are embedded
+  python index.py --full    # re-embed every market
+  python index.py --restart # ignore the checkpoint of an interrupted run
 """
 
 import os
 import json
+import hashlib
 import logging
-from typing import Any, Dict, List
+import argparse
+import queue
+import threading
+from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
-import chromadb
-from chromadb.utils import embedding_functions
-from py_clob_client.client import ClobClient
-from py_clob_client.constants import POLYGON
+
+import upstream
+from embeddings import MODEL_NAME, Embedder
+import market_store
+from lexical import LexicalIndex
+from markets import iso_to_ts, store_record, to_float
 
 # ─── Logging ───────────────────────────────────────────────────────────────
 load_dotenv()
@@ -24,34 +32,28 @@ logging.basicConfig(level=logging.INFO)
 LOGGER = logging.getLogger(__name__)
 
 
-# ─── CLOB helper ───────────────────────────────────────────────────────────
-def _new_clob() -> ClobClient:
-    host = os.getenv("CLOB_HOST", "https://clob.polymarket.com")
-    key = os.getenv("PK", "")
-    api_key = os.getenv("CLOB_API_KEY", "")
-    api_secret = os.getenv("CLOB_SECRET", "")
-    passph = os.getenv("CLOB_PASS_PHRASE", "")
-    client = ClobClient(host, key=key, chain_id=POLYGON)
-    client.set_api_creds(
-        {
-            "apiKey": api_key,
-            "secret": api_secret,
-            "passphrase": passph,
-        }
-    )
-    return client
-
-
 # ─── Chroma setup ──────────────────────────────────────────────────────────
+# Opened on first use: embedding workers are spawned and re-import this
+# module, and must not each load Chroma and the embedding model.
 CHROMA_DIR = os.getenv("CHROMA_PERSIST_DIR", ".chroma")
-chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
-ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-mpnet-base-v2"
-)
-collection = chroma_client.get_or_create_collection(
-    name="prediction_markets",
-    embedding_function=ef,
-)
+_collection_obj = None
+
+
+def _collection():
+    global _collection_obj
+    if _collection_obj is None:
+        import chromadb
+        from chromadb.utils import embedding_functions
+
+        chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
+        ef = embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name=MODEL_NAME
+        )
+        _collection_obj = chroma_client.get_or_create_collection(
+            name="prediction_markets",
+            embedding_function=ef,
+        )
+    return _collection_obj
 
 
 # ─── Batch‐upsert helper ────────────────────────────────────────────────────
@@ -61,9 +63,13 @@ def upsert_in_batches(
     documents: List[str],
     metadatas: List[Dict[str, Any]],
     batch_size: int = 5000,
+    embeddings: Optional[List[List[float]]] = None,
 ) -> None:
     """
     Upsert in chunks of at most `batch_size` items.
+
+    When `embeddings` are given, Chroma stores them as-is instead of running
+    its embedding function.
     """
     total = len(ids)
     for i in range(0, total, batch_size):
@@ -74,72 +80,418 @@ def upsert_in_batches(
             ids=chunk_ids,
             documents=chunk_docs,
             metadatas=chunk_metas,
+            embeddings=embeddings[i : i + batch_size] if embeddings else None,
         )
         LOGGER.info(f"  Upserted batch {i}–{i+len(chunk_ids)} / {total}")
 
 
-# ─── Indexing routine ─────────────────────────────────────────────────────
-def index_markets() -> None:
+# ─── Document / metadata builders ─────────────────────────────────────────
+# Fields that move with trading activity. They are kept out of the embedded
+# document so that a price or volume change only refreshes metadata.
+VOLATILE_FIELDS = {
+    "active",
+    "closed",
+    "archived",
+    "accepting_orders",
+    "accepting_order_timestamp",
+    "rewards",
+    "volume",
+}
+VOLATILE_TOKEN_FIELDS = {"price", "winner"}
+
+
+def build_document(m: Dict[str, Any]) -> str:
     """
-    Fetch every market from the CLOB API and upsert it into Chroma.
+    Build a single text blob from every non-null, non-volatile field.
     """
-    clob = _new_clob()
+    parts: List[str] = []
+    for k, v in m.items():
+        if v is None or v == "" or k in VOLATILE_FIELDS:
+            continue
+        if k == "tokens" and isinstance(v, list):
+            v = [
+                {tk: tv for tk, tv in tok.items() if tk not in VOLATILE_TOKEN_FIELDS}
+                for tok in v
+            ]
+        if isinstance(v, (str, bool, int, float)):
+            parts.append(f"{k}: {v}")
+        elif isinstance(v, (list, dict)) and v:
+            parts.append(f"{k}: {json.dumps(v, default=str)}")
+    return " ".join(parts)
+
+
+def build_metadata(m: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Sanitize metadata for Chroma (only primitives or JSON strings).
+    """
+    clean_meta: Dict[str, Any] = {}
+    for k, v in m.items():
+        if isinstance(v, (str, int, float, bool)):
+            clean_meta[k] = v
+        elif v is None:
+            clean_meta[k] = ""
+        else:
+            clean_meta[k] = json.dumps(v, default=str)
+
+    # numeric fields for server-side range filters
+    end_ts = iso_to_ts(m.get("end_date_iso"))
+    if end_ts is not None:
+        clean_meta["end_ts"] = end_ts
+    volume = to_float(m.get("volume"))
+    if volume is not None:
+        clean_meta["volume"] = volume
+    return clean_meta
+
 
-    # 1) page through all markets
-    markets = []
-    cursor = ""
-    while True:
-        page = clob.get_markets(next_cursor=cursor)
-        cursor = page.get("next_cursor", "")
-        data = page.get("data", [])
-        markets.extend(data)
-        if not cursor or cursor == "LTE=":
-            break
-    LOGGER.info("Fetched %d markets from CLOB API", len(markets))
+def content_hash(value: Any) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha1(value.encode("utf-8")).hexdigest()
+
+
+# ─── Resumable checkpoint ──────────────────────────────────────────────────
+# After each page is written, the cursor of the next page and the ids seen so
+# far are recorded so that an interrupted run resumes where it stopped. Before
+# a page is written its counts are recorded as "pending": if the run dies
+# mid-page, the resumed run re-diffs that page against its own partial writes
+# (which then look unchanged), so it takes the page's counts from there.
+STATE_DIR = os.getenv("INDEX_STATE_DIR", CHROMA_DIR)
+CURSOR_FILE = os.path.join(STATE_DIR, "index_cursor.json")
+SEEN_FILE = os.path.join(STATE_DIR, "index_seen.txt")
+EXISTING_FILE = os.path.join(STATE_DIR, "index_existing.txt")
+# (condition_id, question, slug, description) of every page written so far,
+# for the keyword index built at the end of the run
+LEXICAL_FILE = os.path.join(STATE_DIR, "index_lexical.jsonl")
+QUEUE_DEPTH = int(os.getenv("INDEX_QUEUE_DEPTH", "2"))
+EMBEDDING_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH", os.path.join(STATE_DIR, "embedding_cache.sqlite3")
+)
+
+
+def _load_checkpoint() -> Optional[Dict[str, Any]]:
+    try:
+        with open(CURSOR_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_cursor(state: Dict[str, Any]) -> None:
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = CURSOR_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, CURSOR_FILE)
+
+
+def _save_pending(cursor: str, counts: Dict[str, int], state: Dict[str, Any]) -> None:
+    _write_cursor({**state, "cursor": cursor, "pending": counts})
+
+
+def _save_checkpoint(cursor: str, ids: List[str], state: Dict[str, Any]) -> None:
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(SEEN_FILE, "a", encoding="utf-8") as f:
+        f.writelines(f"{cid}\n" for cid in ids)
+    _write_cursor({**state, "cursor": cursor})
+
+
+def _read_ids(path: str) -> set:
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def _clear_checkpoint() -> None:
+    for path in (CURSOR_FILE, SEEN_FILE, EXISTING_FILE, LEXICAL_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    market_store.clear_staging()
+
+
+# ─── Pipeline stages ──────────────────────────────────────────────────────
+_DONE = object()
+
+
+def _put(q: "queue.Queue", item: Any, stop: threading.Event) -> bool:
+    """
+    Blocking put that gives up once the pipeline is being torn down.
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
 
-    # 2) prepare ids/docs/metas
+
+def _fetch_pages(cursor: str, out_q: "queue.Queue", stop: threading.Event) -> None:
+    """
+    Stage 1: page through `/markets`, emitting `(next_cursor, markets)`.
+    """
+    try:
+        while not stop.is_set():
+            page = upstream.get_json("/markets", params={"next_cursor": cursor})
+            cursor = page.get("next_cursor", "")
+            if not _put(out_q, (cursor, page.get("data", [])), stop):
+                return
+            if not cursor or cursor == "LTE=":
+                break
+    except BaseException as e:
+        _put(out_q, e, stop)
+        return
+    _put(out_q, _DONE, stop)
+
+
+def _stored_hashes(ids: List[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Fetch the content hashes recorded for `ids` by a previous run.
+    """
+    stored: Dict[str, Dict[str, str]] = {}
+    for i in range(0, len(ids), 5000):
+        got = _collection().get(ids=ids[i : i + 5000], include=["metadatas"])
+        for cid, meta in zip(got["ids"], got["metadatas"]):
+            meta = meta or {}
+            stored[cid] = {
+                "doc_hash": meta.get("doc_hash", ""),
+                "meta_hash": meta.get("meta_hash", ""),
+            }
+    return stored
+
+
+def _prepare_batch(markets: List[Dict[str, Any]], full: bool) -> Dict[str, Any]:
+    """
+    Build documents/metadata for one page and diff them against Chroma.
+    """
     ids: List[str] = []
     docs: List[str] = []
     metadatas: List[Dict[str, Any]] = []
+    records: List[Dict[str, Any]] = []
 
     for m in markets:
         cid = m["condition_id"] or ""
         if not cid:
             continue
 
-        # build a single text blob from every non-null field
-        parts: List[str] = []
-        for k, v in m.items():
-            if v is None or v == "":
-                continue
-            if isinstance(v, (str, bool, int, float)):
-                parts.append(f"{k}: {v}")
-            elif isinstance(v, (list, dict)) and v:
-                parts.append(f"{k}: {json.dumps(v, default=str)}")
-        text = " ".join(parts)
-
-        # sanitize metadata for Chroma (only primitives or JSON strings)
-        clean_meta: Dict[str, Any] = {}
-        for k, v in m.items():
-            if isinstance(v, (str, int, float, bool)):
-                clean_meta[k] = v
-            elif v is None:
-                clean_meta[k] = ""
-            else:
-                clean_meta[k] = json.dumps(v, default=str)
+        text = build_document(m)
+        clean_meta = build_metadata(m)
+        clean_meta["doc_hash"] = content_hash(text)
+        clean_meta["meta_hash"] = content_hash(clean_meta)
 
         ids.append(cid)
         docs.append(text)
         metadatas.append(clean_meta)
+        records.append(store_record(m))
 
-    # 3) upsert in batches
-    LOGGER.info("Upserting %d documents into Chroma…", len(ids))
-    upsert_in_batches(collection, ids, docs, metadatas, batch_size=5000)
-    LOGGER.info("Done indexing all markets.")
+    stored = _stored_hashes(ids)
+    batch: Dict[str, Any] = {
+        "ids": ids,
+        "records": records,
+        "embed": ([], [], []),
+        "meta": ([], []),
+        "counts": {"added": 0, "changed": 0, "unchanged": 0},
+    }
+    counts = batch["counts"]
+    for cid, text, meta in zip(ids, docs, metadatas):
+        old = stored.get(cid)
+        if full or old is None or old["doc_hash"] != meta["doc_hash"]:
+            counts["added" if old is None else "changed"] += 1
+            for lst, v in zip(batch["embed"], (cid, text, meta)):
+                lst.append(v)
+        elif old["meta_hash"] != meta["meta_hash"]:
+            counts["changed"] += 1
+            batch["meta"][0].append(cid)
+            batch["meta"][1].append(meta)
+        else:
+            counts["unchanged"] += 1
+    return batch
+
+
+def _prepare_pages(
+    in_q: "queue.Queue", out_q: "queue.Queue", stop: threading.Event, full: bool
+) -> None:
+    """
+    Stage 2: turn each fetched page into an embed/update batch.
+    """
+    while not stop.is_set():
+        try:
+            item = in_q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        if item is _DONE or isinstance(item, BaseException):
+            _put(out_q, item, stop)
+            return
+        cursor, markets = item
+        try:
+            batch = _prepare_batch(markets, full)
+        except BaseException as e:
+            _put(out_q, e, stop)
+            return
+        if not _put(out_q, (cursor, batch), stop):
+            return
+
+
+# ─── Lexical index ────────────────────────────────────────────────────────
+def _stage_lexical(records: List[Dict[str, Any]]) -> None:
+    """
+    Append the searchable fields of one written page to `LEXICAL_FILE`.
+    """
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(LEXICAL_FILE, "a", encoding="utf-8") as f:
+        for r in records:
+            doc = [r["condition_id"], r["question"], r["slug"], r["description"]]
+            f.write(json.dumps(doc) + "\n")
+
+
+def build_lexical_index() -> None:
+    """
+    Rebuild the BM25 keyword index from the pages staged by this run. A page
+    re-staged after an interruption replaces its earlier copy.
+    """
+    docs: Dict[str, List[str]] = {}
+    if os.path.exists(LEXICAL_FILE):
+        with open(LEXICAL_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    doc = json.loads(line)
+                    docs[doc[0]] = doc
+    lexical = LexicalIndex.build(docs.values())
+    lexical.save()
+    LOGGER.info("Built lexical index over %d markets", len(lexical.ids))
+
+
+# ─── Indexing routine ─────────────────────────────────────────────────────
+def index_markets(full: bool = False, resume: bool = True) -> Dict[str, int]:
+    """
+    Fetch every market from the CLOB API and sync it into Chroma.
+
+    Runs as a streaming pipeline: page fetching, document building and
+    embedding/upserting are overlapping stages joined by bounded queues, so
+    memory stays flat and the network stays busy while documents are embedded.
+    Embeddings are computed by a process pool (see `embeddings.py`) and cached
+    on disk, so a crashed or repeated run never recomputes a vector. The final
+    result row of every market is precomputed into `market_store`.
+
+    By default the sync is incremental: markets whose document hash is
+    unchanged are not re-embedded, markets where only metadata (prices,
+    status, volume) moved get a metadata-only update, and markets that no
+    longer exist upstream are deleted. `full=True` re-embeds everything.
+    An interrupted run resumes from its last checkpoint unless `resume=False`.
+
+    Returns counts of added, changed, unchanged and removed markets.
+    """
+    collection = _collection()
+    checkpoint = _load_checkpoint() if resume else None
+    if checkpoint:
+        cursor = checkpoint["cursor"]
+        counts = checkpoint["counts"]
+        full = checkpoint["full"]
+        pending = checkpoint.get("pending")
+        LOGGER.info("Resuming interrupted run at cursor %r", cursor)
+    else:
+        # Snapshot the ids present before this run, to detect removals at the end
+        _clear_checkpoint()
+        os.makedirs(STATE_DIR, exist_ok=True)
+        with open(EXISTING_FILE, "w", encoding="utf-8") as f:
+            f.writelines(f"{cid}\n" for cid in collection.get(include=[])["ids"])
+        cursor = ""
+        counts = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+        pending = None
+    state = {"counts": counts, "full": full}
+
+    pages_q: "queue.Queue" = queue.Queue(maxsize=QUEUE_DEPTH)
+    batches_q: "queue.Queue" = queue.Queue(maxsize=QUEUE_DEPTH)
+    stop = threading.Event()
+    embedder = Embedder(EMBEDDING_CACHE_PATH)
+    stages = [
+        threading.Thread(
+            target=_fetch_pages, args=(cursor, pages_q, stop), daemon=True
+        ),
+        threading.Thread(
+            target=_prepare_pages, args=(pages_q, batches_q, stop, full), daemon=True
+        ),
+    ]
+    for t in stages:
+        t.start()
+
+    # Stage 3: record the page as pending, embed + upsert new/changed
+    # documents, refresh metadata-only changes, then checkpoint the page.
+    try:
+        while True:
+            item = batches_q.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            next_cursor, batch = item
+            if pending is not None:  # the page the interrupted run died in
+                batch["counts"], pending = pending, None
+            _save_pending(cursor, batch["counts"], state)
+            upsert_in_batches(
+                collection,
+                *batch["embed"],
+                batch_size=5000,
+                embeddings=embedder.embed(batch["embed"][1]),
+            )
+            if batch["meta"][0]:
+                collection.update(ids=batch["meta"][0], metadatas=batch["meta"][1])
+            for k, v in batch["counts"].items():
+                counts[k] += v
+            market_store.stage_page(batch["records"])
+            _stage_lexical(batch["records"])
+            _save_checkpoint(next_cursor, batch["ids"], state)
+            cursor = next_cursor
+            LOGGER.info(
+                "Indexed page: %d embedded, %d metadata-only, %d unchanged",
+                len(batch["embed"][0]),
+                len(batch["meta"][0]),
+                batch["counts"]["unchanged"],
+            )
+    finally:
+        stop.set()
+        for t in stages:
+            t.join()
+        embedder.close()
+    LOGGER.info(
+        "Embeddings: %d computed, %d served from cache",
+        embedder.computed,
+        embedder.cached,
+    )
+
+    # drop markets that disappeared upstream
+    removed = sorted(_read_ids(EXISTING_FILE) - _read_ids(SEEN_FILE))
+    for i in range(0, len(removed), 5000):
+        collection.delete(ids=removed[i : i + 5000])
+    counts["removed"] = len(removed)
+
+    # precomputed result rows for the server's columnar side-store, and the
+    # keyword index
+    market_store.publish()
+    build_lexical_index()
+    _clear_checkpoint()
+
+    LOGGER.info(
+        "Done indexing all markets: %(added)d added, %(changed)d changed, "
+        "%(unchanged)d unchanged, %(removed)d removed.",
+        counts,
+    )
+    return counts
 
 
 # ─── Entrypoint ────────────────────────────────────────────────────────────
 if __name__ == "__main__":
-    index_markets()
-    count = collection.count()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="re-embed every market instead of only new or changed ones",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="ignore the checkpoint of an interrupted run and start from page 1",
+    )
+    args = parser.parse_args()
+
+    index_markets(full=args.full, resume=not args.restart)
+    count = _collection().count()
     LOGGER.info(f"Total documents in collection: {count}")
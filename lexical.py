@@ -0,0 +1,166 @@
+"""
+lexical.py — BM25 inverted index over market question, slug and description
+
+Built by `index.py` next to the Chroma store and loaded by `server.py` to
+answer exact and keyword queries (slugs, tickers, names) without running the
+embedding model. `rrf()` merges its ranking with the vector ranking.
+"""
+
+import os
+import pickle
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import regex as re
+
+LOGGER = logging.getLogger(__name__)
+
+INDEX_PATH = os.getenv(
+    "LEXICAL_INDEX_PATH",
+    os.path.join(os.getenv("CHROMA_PERSIST_DIR", ".chroma"), "lexical_index.pkl"),
+)
+K1 = 1.2
+B = 0.75
+QUESTION_WEIGHT = 2  # question terms count double against description terms
+
+_TOKEN_RE = re.compile(r"[\p{L}\p{N}]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def normalize(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+class LexicalIndex:
+    """
+    In-memory BM25 index with exact-match lookups on slug and question.
+    """
+
+    def __init__(self) -> None:
+        self.ids: List[str] = []
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.avgdl = 0.0
+        # term -> (doc positions, term frequencies)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.exact: Dict[str, List[int]] = {}
+
+    @classmethod
+    def build(cls, docs: Iterable[Tuple[str, str, str, str]]) -> "LexicalIndex":
+        """
+        `docs` yields (condition_id, question, slug, description).
+        """
+        idx = cls()
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        exact: Dict[str, List[int]] = defaultdict(list)
+        lengths: List[int] = []
+        for pos, (cid, question, slug, description) in enumerate(docs):
+            idx.ids.append(cid)
+            q_tokens = tokenize(question)
+            tokens = q_tokens * QUESTION_WEIGHT + tokenize(slug) + tokenize(description)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((pos, tf))
+            for key in {normalize(slug), " ".join(q_tokens)}:
+                if key:
+                    exact[key].append(pos)
+        idx.doc_len = np.asarray(lengths, dtype=np.float32)
+        idx.avgdl = float(idx.doc_len.mean()) if lengths else 0.0
+        idx.postings = {
+            term: (
+                np.fromiter((p for p, _ in plist), dtype=np.int32, count=len(plist)),
+                np.fromiter((t for _, t in plist), dtype=np.float32, count=len(plist)),
+            )
+            for term, plist in postings.items()
+        }
+        idx.exact = dict(exact)
+        return idx
+
+    def exact_matches(self, query: str) -> List[str]:
+        return [self.ids[p] for p in self.exact.get(normalize(query), [])]
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Top `k` (condition_id, score) pairs; exact slug/question matches first.
+        """
+        n = len(self.ids)
+        if not n:
+            return []
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            hit = self.postings.get(term)
+            if hit is None:
+                continue
+            pos, tf = hit
+            idf = np.log(1.0 + (n - len(pos) + 0.5) / (len(pos) + 0.5))
+            norm = K1 * (1.0 - B + B * self.doc_len[pos] / self.avgdl)
+            scores[pos] += idf * tf * (K1 + 1.0) / (tf + norm)
+
+        exact = self.exact.get(normalize(query), [])
+        if exact:
+            scores[exact] = np.inf
+        nonzero = np.flatnonzero(scores)
+        if not len(nonzero):
+            return []
+        if len(nonzero) > k:
+            nonzero = nonzero[np.argpartition(-scores[nonzero], k - 1)[:k]]
+        top = nonzero[np.argsort(-scores[nonzero], kind="stable")]
+        return [(self.ids[p], float(scores[p])) for p in top]
+
+    def save(self, path: str = INDEX_PATH) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = INDEX_PATH) -> "LexicalIndex":
+        idx = cls()
+        with open(path, "rb") as f:
+            idx.__dict__.update(pickle.load(f))
+        return idx
+
+
+def rrf(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """
+    Reciprocal-rank fusion of several rankings of ids.
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking):
+            scores[cid] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+# ─── Loading (query time) ──────────────────────────────────────────────────
+class LexicalIndexFile:
+    """
+    Lazily loaded index file, reloaded when `index.py` rewrites it.
+    """
+
+    def __init__(self, path: str = INDEX_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._index: Optional[LexicalIndex] = None
+
+    def get(self) -> Optional[LexicalIndex]:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return self._index
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        self._index = LexicalIndex.load(self.path)
+                        self._mtime = mtime
+                    except Exception as e:
+                        LOGGER.warning("Could not load lexical index: %s", e)
+        return self._index
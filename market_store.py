@@ -0,0 +1,227 @@
+"""
+market_store.py — Columnar side-store of precomputed market rows
+
+`index.py` precomputes the result row of every market once (outcomes, float
+prices, normalized dates; see `markets.store_record`) and writes them to an
+Arrow IPC file keyed by condition_id. The server memory-maps that file, so a
+search only asks Chroma for ids and gathers the rows from the map, and
+filtering/sorting a listing is a vectorized Arrow operation.
+
+pyarrow is optional: without it `available()` is False and the server falls
+back to decoding Chroma metadata.
+"""
+
+import os
+import glob
+import time
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pc = ipc = None
+
+from markets import ROW_FIELDS
+
+LOGGER = logging.getLogger(__name__)
+
+STORE_DIR = os.getenv(
+    "MARKET_STORE_DIR",
+    os.path.join(os.getenv("CHROMA_PERSIST_DIR", ".chroma"), "market_store"),
+)
+STAGING_DIR = os.path.join(STORE_DIR, "staging")
+RELOAD_INTERVAL = float(os.getenv("MARKET_STORE_RELOAD_INTERVAL", "5"))
+
+SCHEMA = (
+    pa.schema(
+        [
+            ("condition_id", pa.string()),
+            ("question_id", pa.string()),
+            ("slug", pa.string()),
+            ("question", pa.string()),
+            ("description", pa.string()),
+            ("outcomes", pa.list_(pa.string())),
+            ("prices", pa.list_(pa.float64())),
+            ("volume", pa.float64()),
+            ("active", pa.bool_()),
+            ("closed", pa.bool_()),
+            ("startDate", pa.string()),
+            ("endDate", pa.string()),
+            ("token_ids", pa.list_(pa.string())),
+            ("token_outcomes", pa.list_(pa.string())),
+            ("end_ts", pa.int64()),
+        ]
+    )
+    if pa is not None
+    else None
+)
+
+SORT_COLUMNS = {"volume": "volume", "end_date": "end_ts"}
+
+
+def available() -> bool:
+    return pa is not None
+
+
+# ─── Writing (index time) ──────────────────────────────────────────────────
+def _write(path: str, table: "pa.Table") -> None:
+    tmp = path + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def clear_staging() -> None:
+    for path in glob.glob(os.path.join(STAGING_DIR, "*.arrow")):
+        os.remove(path)
+
+
+def stage_page(records: List[Dict[str, Any]]) -> None:
+    """
+    Persist one indexed page of records; merged by `publish()` at the end.
+    Staged pages survive an interrupted run, so a resumed run still
+    publishes the rows of the pages written before the interruption.
+    """
+    if not available() or not records:
+        return
+    os.makedirs(STAGING_DIR, exist_ok=True)
+    n = len(glob.glob(os.path.join(STAGING_DIR, "*.arrow")))
+    table = pa.Table.from_pylist(records, schema=SCHEMA)
+    _write(os.path.join(STAGING_DIR, f"page-{n:06d}.arrow"), table)
+
+
+def publish() -> Optional[str]:
+    """
+    Merge the staged pages into a new store file (last record per
+    condition_id wins) and drop older store files where possible.
+    """
+    if not available():
+        return None
+    pages = sorted(glob.glob(os.path.join(STAGING_DIR, "*.arrow")))
+    tables = [load_table(p) for p in pages]
+    table = pa.concat_tables(tables) if tables else SCHEMA.empty_table()
+
+    last: Dict[str, int] = {}
+    for i, cid in enumerate(table.column("condition_id").to_pylist()):
+        last[cid] = i
+    table = table.take(sorted(last.values()))
+
+    # A fresh name per publish: a server may still have the old file mapped,
+    # and mapped files cannot be replaced on every platform.
+    path = os.path.join(STORE_DIR, f"markets-{time.time_ns()}.arrow")
+    _write(path, table)
+    for old in _store_files()[:-1]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    clear_staging()
+    LOGGER.info("Published %d market rows to %s", table.num_rows, path)
+    return path
+
+
+def load_table(path: str) -> "pa.Table":
+    return ipc.open_file(pa.memory_map(path)).read_all()
+
+
+def _store_files(directory: str = STORE_DIR) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, "markets-*.arrow")))
+
+
+# ─── Reading (query time) ──────────────────────────────────────────────────
+class MarketStore:
+    """
+    Memory-mapped view of the newest published store file.
+
+    The file is re-checked at most every `RELOAD_INTERVAL` seconds, so a
+    re-index is picked up without restarting the server.
+    """
+
+    def __init__(self, directory: str = STORE_DIR) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._path: Optional[str] = None
+        # (table, condition_id -> row position), swapped together on reload
+        self._state = (None, {})
+        self._checked: Optional[float] = None
+
+    def _load(self):
+        now = time.monotonic()
+        if not available() or (
+            self._checked is not None and now - self._checked < RELOAD_INTERVAL
+        ):
+            return self._state
+        with self._lock:
+            self._checked = now
+            files = _store_files(self.directory)
+            path = files[-1] if files else None
+            if path and path != self._path:
+                table = load_table(path)
+                ids = table.column("condition_id").to_pylist()
+                self._state = (table, {cid: i for i, cid in enumerate(ids)})
+                self._path = path
+        return self._state
+
+    def table(self):
+        return self._load()[0]
+
+    def records(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Full records (including token ids) for the ids present in the store.
+        """
+        table, pos = self._load()
+        if table is None:
+            return {}
+        hits = [(cid, pos[cid]) for cid in ids if cid in pos]
+        if not hits:
+            return {}
+        rows = table.take([i for _, i in hits]).to_pylist()
+        return {cid: row for (cid, _), row in zip(hits, rows)}
+
+    def select(
+        self,
+        active: Optional[bool] = None,
+        closed: Optional[bool] = None,
+        min_volume: Optional[float] = None,
+        end_ts_from: Optional[int] = None,
+        end_ts_to: Optional[int] = None,
+        sort_by: Optional[str] = None,
+        descending: bool = True,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Filter, sort and page the store; None when no store is published.
+        """
+        table = self.table()
+        if table is None:
+            return None
+        masks = []
+        if active is not None:
+            masks.append(pc.equal(table["active"], active))
+        if closed is not None:
+            masks.append(pc.equal(table["closed"], closed))
+        if min_volume is not None:
+            masks.append(pc.greater_equal(table["volume"], min_volume))
+        if end_ts_from is not None:
+            masks.append(pc.greater_equal(table["end_ts"], end_ts_from))
+        if end_ts_to is not None:
+            masks.append(pc.less_equal(table["end_ts"], end_ts_to))
+        if masks:
+            mask = masks[0]
+            for m in masks[1:]:
+                mask = pc.and_(mask, m)
+            table = table.filter(pc.fill_null(mask, False))
+        if sort_by in SORT_COLUMNS:
+            order = "descending" if descending else "ascending"
+            # nulls (unknown volume / end date) sort last
+            idx = pc.sort_indices(table, sort_keys=[(SORT_COLUMNS[sort_by], order)])
+            table = table.take(idx[offset : offset + limit])
+        else:
+            table = table.slice(offset, limit)
+        return table.select(ROW_FIELDS).to_pylist()
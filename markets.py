@@ -0,0 +1,103 @@
+"""
+markets.py — Helpers for normalising CLOB market payloads
+
+Shared by `index.py` (at index time) and `server.py` (at query time) so both
+agree on derived fields.
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+# Keys of a market row as returned by the search/lookup tools
+ROW_FIELDS = [
+    "condition_id",
+    "question_id",
+    "slug",
+    "question",
+    "description",
+    "outcomes",
+    "prices",
+    "volume",
+    "active",
+    "closed",
+    "startDate",
+    "endDate",
+]
+
+
+def iso_to_ts(value: Any) -> Optional[int]:
+    """
+    Epoch seconds for an ISO-8601 date/datetime; naive values are UTC.
+    Returns None for empty or unparseable input.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def to_float(value: Any) -> Optional[float]:
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _tokens(m: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Chroma metadata stores `tokens` as a JSON string, the CLOB as a list
+    raw = m.get("tokens") or []
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except json.JSONDecodeError:
+            return []
+    return raw if isinstance(raw, list) else []
+
+
+def market_row(m: Dict[str, Any], condition_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Result row for a CLOB market payload or its Chroma metadata record.
+    """
+    outcomes, prices = [], []
+    for tok in _tokens(m):
+        out = tok.get("outcome")
+        pr = tok.get("price")
+        if out is None or pr is None:
+            continue
+        outcomes.append(out)
+        prices.append(to_float(pr))
+
+    return {
+        "condition_id": condition_id or m.get("condition_id"),
+        "question_id": m.get("question_id") or "",
+        "slug": m.get("market_slug") or "",
+        "question": m.get("question") or "",
+        "description": m.get("description") or "",
+        "outcomes": outcomes,
+        "prices": prices,
+        "volume": to_float(m.get("volume")),
+        "active": m.get("active") if isinstance(m.get("active"), bool) else None,
+        "closed": m.get("closed") if isinstance(m.get("closed"), bool) else None,
+        "startDate": m.get("game_start_time") or m.get("start_date_iso") or None,
+        "endDate": m.get("end_date_iso") or None,
+    }
+
+
+def store_record(m: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    `market_row` plus the columns the side-store keeps for filtering and for
+    seeding the market cache (token ids, numeric end date).
+    """
+    row = market_row(m)
+    row["token_ids"] = [str(tok.get("token_id", "")) for tok in _tokens(m)]
+    row["token_outcomes"] = [str(tok.get("outcome", "")) for tok in _tokens(m)]
+    row["end_ts"] = iso_to_ts(m.get("end_date_iso"))
+    return row
@@ -0,0 +1,256 @@
+"""
+metrics.py — In-process latency, upstream and payload instrumentation
+
+A small registry of counters and fixed-bucket histograms, cheap enough to
+leave on all the time (a lock and a bisect per observation). `server.py`
+wraps every tool with `instrument_tool`, times internal stages with
+`stage()`, and `upstream.py` records every CLOB request. `snapshot()` feeds
+the `server_stats` tool; `prometheus()` renders the Prometheus text format.
+"""
+
+import time
+import asyncio
+import functools
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+PREFIX = "polymarket"
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+)  # fmt: skip
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (counts per upper bound, plus count and sum).
+    """
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate by linear interpolation inside the bucket (as Prometheus'
+        histogram_quantile does); values past the last bucket report its bound.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lo = self.buckets[i - 1] if i else 0.0
+                return lo + (self.buckets[i] - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 6) if self.count else None,
+            "p50": _round(self.quantile(0.5)),
+            "p95": _round(self.quantile(0.95)),
+            "p99": _round(self.quantile(0.99)),
+        }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 6) if value is not None else None
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and histograms keyed by (name, labels).
+    """
+
+    def __init__(self) -> None:
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._caches: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        **labels: str,
+    ) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def register_cache(self, name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """
+        Report a cache's `stats()` (hits, misses, size) under `name`.
+        """
+        self._caches[name] = stats
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        Time a block as stage `name` (e.g. "embedding", "chroma_query").
+        """
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - t0, stage=name)
+
+    # ─── Export ────────────────────────────────────────────────────────────
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            histograms = {
+                n: {k: h.summary() for k, h in s.items()}
+                for n, s in self._histograms.items()
+            }
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "counters": {
+                n: {_label_str(k): v for k, v in s.items()} for n, s in counters.items()
+            },
+            "histograms": {
+                n: {_label_str(k): v for k, v in s.items()}
+                for n, s in histograms.items()
+            },
+            "caches": {name: stats() for name, stats in self._caches.items()},
+        }
+
+    def prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f"{PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in series.items():
+                    lines.append(f"{metric}{_label_block(key)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                metric = f"{PREFIX}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for key, hist in series.items():
+                    cumulative = 0
+                    for bound, n in zip(hist.buckets, hist.counts):
+                        cumulative += n
+                        le = (("le", f"{bound:g}"),)
+                        lines.append(
+                            f"{metric}_bucket{_label_block(key + le)} {cumulative}"
+                        )
+                    inf = (("le", "+Inf"),)
+                    lines.append(
+                        f"{metric}_bucket{_label_block(key + inf)} {hist.count}"
+                    )
+                    lines.append(f"{metric}_sum{_label_block(key)} {hist.sum:g}")
+                    lines.append(f"{metric}_count{_label_block(key)} {hist.count}")
+        caches = {name: stats() for name, stats in self._caches.items()}
+        for field, kind in (
+            ("hits", "counter"),
+            ("misses", "counter"),
+            ("size", "gauge"),
+        ):
+            metric = f"{PREFIX}_cache_{field}" + ("_total" if kind == "counter" else "")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, stats in sorted(caches.items()):
+                if field in stats:
+                    lines.append(f'{metric}{{cache="{name}"}} {stats[field]}')
+        lines.append(f"# TYPE {PREFIX}_uptime_seconds gauge")
+        lines.append(f"{PREFIX}_uptime_seconds {time.time() - self.started:.1f}")
+        return "\n".join(lines) + "\n"
+
+
+def _label_str(key: Labels) -> str:
+    return ",".join(f"{k}={v}" for k, v in key) or "all"
+
+
+def _label_block(key: Labels) -> str:
+    if not key:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in key)
+    return "{" + body + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
+
+
+def payload_size(result: Any) -> int:
+    """
+    Size in bytes of `result` as JSON (the form the MCP client receives).
+    """
+    from pydantic_core import to_json
+
+    try:
+        return len(to_json(result, fallback=str))
+    except Exception:
+        return 0
+
+
+def instrument_tool(fn: Callable) -> Callable:
+    """
+    Record latency, errors and response size of a tool (sync or async).
+    Apply below `@mcp.tool()` so the registered function is the wrapper.
+    """
+    name = fn.__name__
+
+    def record(t0: float, result: Any, error: bool) -> None:
+        METRICS.observe("tool_seconds", time.perf_counter() - t0, tool=name)
+        METRICS.inc("tool_calls_total", tool=name, outcome="error" if error else "ok")
+        if not error:
+            METRICS.observe(
+                "tool_response_bytes", payload_size(result), SIZE_BUCKETS, tool=name
+            )
+
+    if asyncio.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            t0, result, error = time.perf_counter(), None, True
+            try:
+                result = await fn(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                record(t0, result, error)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0, result, error = time.perf_counter(), None, True
+        try:
+            result = fn(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            record(t0, result, error)
+
+    return wrapper
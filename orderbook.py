@@ -0,0 +1,222 @@
+"""
+orderbook.py — In-memory L2 order books
+
+Used by `book_mirror.py` to maintain live books from CLOB websocket updates.
+Each side keeps its price levels in a sorted list (bisect) next to a
+price -> level map, so a level update is a dict write plus, for a new or
+removed price, one list insert or delete.
+
+`shape_book()` turns a book into the compact tool response: summary stats,
+and optionally depth-limited, price-bucketed levels.
+"""
+
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class BookSide:
+    """
+    Price levels of one side of a book, sorted by price (ascending).
+    """
+
+    def __init__(self) -> None:
+        self.prices: List[float] = []
+        # price -> (price, size) as the CLOB sent them (decimal strings)
+        self.levels: Dict[float, Tuple[str, str]] = {}
+
+    def set(self, price: str, size: str) -> None:
+        """
+        Set the size at `price`; a zero size removes the level.
+        """
+        key = float(price)
+        if float(size) == 0:
+            if self.levels.pop(key, None) is not None:
+                del self.prices[bisect_left(self.prices, key)]
+            return
+        if key not in self.levels:
+            insort(self.prices, key)
+        self.levels[key] = (price, size)
+
+    def replace(self, levels: List[Dict[str, str]]) -> None:
+        self.prices, self.levels = [], {}
+        for lvl in levels:
+            self.set(lvl["price"], lvl["size"])
+
+    def to_list(self, descending: bool = False) -> List[Dict[str, str]]:
+        prices = reversed(self.prices) if descending else self.prices
+        return [{"price": self.levels[p][0], "size": self.levels[p][1]} for p in prices]
+
+
+class OrderBook:
+    """
+    L2 book of one token. `timestamp` (ms) is that of the last applied
+    snapshot or update; older updates are ignored.
+    """
+
+    def __init__(self, token_id: str) -> None:
+        self.token_id = token_id
+        self.bids = BookSide()
+        self.asks = BookSide()
+        self.timestamp = 0
+        self.ready = False
+
+    def load(self, snapshot: Dict[str, Any]) -> None:
+        """
+        Replace the book with a REST `/book` response or websocket "book" event.
+        """
+        self.bids.replace(snapshot.get("bids", []))
+        self.asks.replace(snapshot.get("asks", []))
+        self.timestamp = int(snapshot.get("timestamp") or 0)
+        self.ready = True
+
+    def apply(self, side: str, price: str, size: str, timestamp: int) -> bool:
+        """
+        Apply one level update ("BUY" = bids, "SELL" = asks); False if stale.
+        """
+        if timestamp < self.timestamp:
+            return False
+        (self.bids if side.upper() == "BUY" else self.asks).set(price, size)
+        self.timestamp = timestamp
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Same shape and level order as the REST `/book` response.
+        """
+        return {
+            "asset_id": self.token_id,
+            "timestamp": str(self.timestamp),
+            "bids": self.bids.to_list(),
+            "asks": self.asks.to_list(descending=True),
+        }
+
+
+# ─── Response shaping ──────────────────────────────────────────────────────
+def _side_arrays(
+    levels: List[Dict[str, str]], descending: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (prices, sizes) of one side as floats, best price first.
+    """
+    n = len(levels)
+    prices = np.fromiter((float(lvl["price"]) for lvl in levels), np.float64, n)
+    sizes = np.fromiter((float(lvl["size"]) for lvl in levels), np.float64, n)
+    order = np.argsort(-prices if descending else prices, kind="stable")
+    return prices[order], sizes[order]
+
+
+def _bucket(
+    prices: np.ndarray, sizes: np.ndarray, width: float, bids: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sum sizes into price buckets of `width`; bids round down and asks round
+    up, so a bucket never looks better than the levels in it.
+    """
+    steps = prices / width
+    # the epsilon keeps e.g. 0.3 / 0.1 = 2.9999999999999996 in bucket 3
+    keys = np.floor(steps + 1e-9) if bids else np.ceil(steps - 1e-9)
+    uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    totals = np.bincount(inverse, weights=sizes)
+    order = np.argsort(first)  # keep best-first order
+    return np.round(uniq[order] * width, 10), totals[order]
+
+
+def book_summary(
+    bid_prices: np.ndarray,
+    bid_sizes: np.ndarray,
+    ask_prices: np.ndarray,
+    ask_sizes: np.ndarray,
+    within: float,
+) -> Dict[str, Any]:
+    """
+    Top-of-book stats, plus size resting within `within` of the mid on each
+    side and the imbalance (bid - ask) / (bid + ask) of those depths.
+    """
+    best_bid = float(bid_prices[0]) if len(bid_prices) else None
+    best_ask = float(ask_prices[0]) if len(ask_prices) else None
+    summary: Dict[str, Any] = {
+        "best_bid": best_bid,
+        "best_ask": best_ask,
+        "spread": None,
+        "mid": None,
+        "microprice": None,
+        "bid_depth": None,
+        "ask_depth": None,
+        "imbalance": None,
+    }
+    if best_bid is None or best_ask is None:
+        return summary
+    mid = (best_bid + best_ask) / 2
+    top_bid, top_ask = float(bid_sizes[0]), float(ask_sizes[0])
+    bid_depth = float(bid_sizes[bid_prices >= mid - within - 1e-9].sum())
+    ask_depth = float(ask_sizes[ask_prices <= mid + within + 1e-9].sum())
+    total = bid_depth + ask_depth
+    summary.update(
+        spread=round(best_ask - best_bid, 10),
+        mid=round(mid, 10),
+        microprice=round(
+            (best_bid * top_ask + best_ask * top_bid) / (top_bid + top_ask), 10
+        ),
+        bid_depth=bid_depth,
+        ask_depth=ask_depth,
+        imbalance=round((bid_depth - ask_depth) / total, 4) if total else None,
+    )
+    return summary
+
+
+def check_shape(depth: Optional[int], bucket: Optional[float]) -> None:
+    """
+    Raise ValueError for a negative `depth` or a non-positive `bucket`.
+    """
+    if depth is not None and depth < 0:
+        raise ValueError(f"depth must be >= 0, got {depth}")
+    if bucket is not None and bucket <= 0:
+        raise ValueError(f"bucket must be > 0, got {bucket}")
+
+
+def shape_book(
+    book: Dict[str, Any],
+    depth: Optional[int] = None,
+    bucket: Optional[float] = None,
+    within_cents: float = 5,
+    fmt: str = "levels",
+) -> Dict[str, Any]:
+    """
+    Summary stats of a REST-shaped book plus its levels, best first:
+    `bucket` aggregates levels into price buckets, `depth` keeps the best N
+    per side, and `fmt` is "levels" ([{"price", "size"}] strings), "arrays"
+    (parallel float lists) or "summary" (no levels).
+    """
+    check_shape(depth, bucket)
+    bid_p, bid_s = _side_arrays(book.get("bids", []), descending=True)
+    ask_p, ask_s = _side_arrays(book.get("asks", []), descending=False)
+    out = book_summary(bid_p, bid_s, ask_p, ask_s, within_cents / 100)
+    if fmt == "summary":
+        return out
+    if bucket is not None:
+        bid_p, bid_s = _bucket(bid_p, bid_s, bucket, bids=True)
+        ask_p, ask_s = _bucket(ask_p, ask_s, bucket, bids=False)
+    if depth is not None:
+        bid_p, bid_s, ask_p, ask_s = (
+            bid_p[:depth],
+            bid_s[:depth],
+            ask_p[:depth],
+            ask_s[:depth],
+        )
+    if fmt == "arrays":
+        out["bids"] = {"prices": bid_p.tolist(), "sizes": bid_s.tolist()}
+        out["asks"] = {"prices": ask_p.tolist(), "sizes": ask_s.tolist()}
+    else:
+        out["bids"] = _levels(bid_p, bid_s)
+        out["asks"] = _levels(ask_p, ask_s)
+    return out
+
+
+def _levels(prices: np.ndarray, sizes: np.ndarray) -> List[Dict[str, str]]:
+    return [{"price": _fmt(p), "size": _fmt(s)} for p, s in zip(prices, sizes)]
+
+
+def _fmt(x: float) -> str:
+    return np.format_float_positional(x, trim="-")
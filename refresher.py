@@ -0,0 +1,146 @@
+"""
+refresher.py — Keep the most requested markets warm in the background
+
+`HotSet` scores keys by how often they are requested, with exponential decay,
+and `Refresher` periodically re-fetches the hottest ones on a daemon thread so
+tool calls for popular markets hit warm caches. Each cycle spends at most a
+fixed number of upstream requests; what a refresh consists of is supplied by
+the caller (see `server.py`).
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# A refresh plan: (upstream requests it costs, function doing it) per step.
+Plan = List[Tuple[int, Callable[[], Any]]]
+
+
+class HotSet:
+    """
+    Exponentially decayed request counts: a request adds 1 to a key's score
+    and scores halve every `half_life` seconds. At most `max_tracked` keys
+    are kept; the coldest are dropped beyond that.
+    """
+
+    def __init__(self, half_life: float = 3600, max_tracked: int = 1000) -> None:
+        self.half_life = half_life
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        # key -> (score, time of the score)
+        self._scores: Dict[Hashable, Tuple[float, float]] = {}
+
+    def _decayed(self, score: float, t: float, now: float) -> float:
+        return score * 0.5 ** ((now - t) / self.half_life)
+
+    def touch(self, key: Hashable) -> None:
+        now = time.monotonic()
+        with self._lock:
+            score, t = self._scores.get(key, (0.0, now))
+            self._scores[key] = (self._decayed(score, t, now) + 1.0, now)
+            if len(self._scores) > self.max_tracked:
+                self._prune(now)
+
+    def _prune(self, now: float) -> None:
+        ranked = sorted(
+            self._scores.items(),
+            key=lambda kv: self._decayed(kv[1][0], kv[1][1], now),
+            reverse=True,
+        )
+        self._scores = dict(ranked[: self.max_tracked // 2])
+
+    def top(self, n: int) -> List[Tuple[Hashable, float]]:
+        """
+        The `n` hottest keys with their current scores, hottest first.
+        """
+        now = time.monotonic()
+        with self._lock:
+            scored = [
+                (key, self._decayed(score, t, now))
+                for key, (score, t) in self._scores.items()
+            ]
+        scored.sort(key=lambda kv: kv[1], reverse=True)
+        return scored[:n]
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+class Refresher:
+    """
+    Every `interval` seconds (start to start), run `plan(key)` for the `size` hottest keys of
+    `hot`, hottest first, until `budget` upstream requests are spent.
+    """
+
+    def __init__(
+        self,
+        hot: HotSet,
+        plan: Callable[[Hashable], Plan],
+        size: int = 10,
+        interval: float = 10,
+        budget: int = 60,
+    ) -> None:
+        self.hot = hot
+        self.plan = plan
+        self.size = size
+        self.interval = interval
+        self.budget = budget
+        self.cycles = 0
+        self.requests = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="market-refresher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _run(self) -> None:
+        # Fixed-rate: cycles start every `interval` however long they take; an
+        # overrunning cycle is followed immediately by the next, not by a
+        # burst of missed ones.
+        due = time.monotonic() + self.interval
+        while not self._stop.wait(max(0.0, due - time.monotonic())):
+            self.run_once()
+            due = max(due + self.interval, time.monotonic())
+
+    def run_once(self) -> int:
+        """
+        One refresh cycle; returns the upstream requests spent.
+        """
+        spent = 0
+        for key, _ in self.hot.top(self.size):
+            for cost, step in self.plan(key):
+                if spent + cost > self.budget:
+                    self.cycles += 1
+                    return spent
+                spent += cost
+                self.requests += cost
+                try:
+                    step()
+                except Exception as e:
+                    self.errors += 1
+                    LOGGER.debug("Refresh of %s failed: %s", key, e)
+        self.cycles += 1
+        return spent
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self.hot),
+            "hot": [key for key, _ in self.hot.top(self.size)],
+            "cycles": self.cycles,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
@@ -0,0 +1,83 @@
+"""
+series.py — NumPy helpers for price-history series
+
+`align()` puts the per-outcome histories of a market on one shared timestamp
+index, and `lttb()` picks a shape-preserving subset of points so long charts
+can be returned with a bounded number of points.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+def to_arrays(history: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    [{"t": ..., "p": ...}] -> (int64 timestamps, float64 prices).
+    """
+    n = len(history)
+    t = np.fromiter((pt["t"] for pt in history), dtype=np.int64, count=n)
+    p = np.fromiter((pt["p"] for pt in history), dtype=np.float64, count=n)
+    return t, p
+
+
+def align(
+    histories: Dict[str, List[Dict[str, Any]]],
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Sorted union of all timestamps, and each outcome's prices on that index
+    (NaN where an outcome has no point at a timestamp).
+    """
+    arrays = {o: to_arrays(h) for o, h in histories.items()}
+    ts = np.zeros(0, dtype=np.int64)
+    for t, _ in arrays.values():
+        ts = np.union1d(ts, t)
+    series = {}
+    for o, (t, p) in arrays.items():
+        col = np.full(len(ts), np.nan)
+        col[np.searchsorted(ts, t)] = p
+        series[o] = col
+    return ts, series
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n: int) -> np.ndarray:
+    """
+    Indices of the `n` points kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every bucket in between keeps
+    the point forming the largest triangle with the previously kept point and
+    the average of the next bucket. Gaps (NaN) in `y` are interpolated for the
+    selection only. A `y` shorter than `x` (e.g. empty) keeps every point.
+    """
+    size = len(x)
+    n = max(n, 3)
+    if size <= n or len(y) < size:
+        return np.arange(size)  # nothing to downsample on: keep everything
+    x = x.astype(np.float64)
+    valid = ~np.isnan(y)
+    if not valid.all():
+        y = np.interp(x, x[valid], y[valid]) if valid.any() else np.zeros(size)
+
+    # n - 2 buckets over the interior points, plus the last point as the
+    # "next bucket" of the final interior bucket
+    edges = np.append(np.linspace(1, size - 1, n - 1).astype(np.int64), size)
+    keep = np.empty(n, dtype=np.int64)
+    keep[0], keep[-1] = 0, size - 1
+    a = 0
+    for i in range(n - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = slice(edges[i + 1], edges[i + 2])
+        cx, cy = x[nxt].mean(), y[nxt].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def to_list(values: np.ndarray) -> List[Optional[float]]:
+    """
+    JSON-ready list with None for missing (NaN) values.
+    """
+    out = values.astype(object)
+    out[np.isnan(values)] = None
+    return out.tolist()
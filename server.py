@@ -1,189 +1,660 @@
 import os
+import time
+import functools
 import logging
-from typing import Any, Dict, List, Optional
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 import regex as re
-import json
 import numpy as np
-import pandas as pd
-from statsmodels.tsa.arima.model import ARIMA
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
-import chromadb
-from chromadb.utils import embedding_functions
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
-from py_clob_client.client import ClobClient, ApiCreds
-from py_clob_client.constants import POLYGON
+
+import upstream
+import forecasting
+import history_store
+from cache import MarketCache, TTLCache
+from embeddings import MODEL_NAME
+from markets import ROW_FIELDS, iso_to_ts, market_row
+from market_store import SORT_COLUMNS, MarketStore
+from lexical import LexicalIndexFile, rrf
+from history_store import PriceHistoryStore
+from book_mirror import BookMirror
+from orderbook import check_shape, shape_book
+from refresher import HotSet, Plan, Refresher
+from metrics import METRICS, instrument_tool
+from series import align, lttb, to_list
+
+# chromadb, sentence-transformers, pandas and statsmodels take seconds to
+# import and load, so they are pulled in lazily (or by the warm-up thread)
+# rather than at module import; see `_collection()` and `_warm_up()`.
 
 # ─── Configuration & Logging ───────────────────────────────────────────────
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 LOGGER = logging.getLogger(__name__)
 
+# ─── Chroma Vector DB Setup ────────────────────────────────────────────────
+CHROMA_DIR = os.getenv("CHROMA_PERSIST_DIR", ".chroma")
+_collection_obj = None
+_ef = None
+_collection_lock = threading.Lock()
+
+
+def _collection():
+    """
+    Open the Chroma collection (and load the embedding model) on first use.
+    """
+    global _collection_obj, _ef
+    if _collection_obj is None:
+        with _collection_lock:
+            if _collection_obj is None:
+                import chromadb
+                from chromadb.utils import embedding_functions
+
+                chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
+                _ef = embedding_functions.SentenceTransformerEmbeddingFunction(
+                    model_name=MODEL_NAME
+                )
+                _collection_obj = chroma_client.get_or_create_collection(
+                    name="prediction_markets",
+                    embedding_function=_ef,
+                )
+    return _collection_obj
+
+
+# ─── Background Warm-up ────────────────────────────────────────────────────
+WARMUP = os.getenv("WARMUP", "1") != "0"
+WARMUP_DELAY = float(os.getenv("WARMUP_DELAY", "0.5"))
+
+
+def _warm_up() -> None:
+    """
+    Load the heavy resources in the background so the first search or
+    forecast does not pay for them. Runs shortly after the server starts, so
+    the MCP handshake and tools that need none of this answer immediately.
+    """
+    time.sleep(WARMUP_DELAY)
+    t0 = time.perf_counter()
+    try:
+        _collection()
+        _ef(["warm-up"])
+        LEXICAL_INDEX.get()
+        import pandas  # noqa: F401
+        from statsmodels.tsa.arima.model import ARIMA  # noqa: F401
+
+        forecasting.warm_up()
+    except Exception as e:
+        LOGGER.warning("Warm-up failed: %s", e)
+        return
+    LOGGER.info("Warm-up finished in %.2fs", time.perf_counter() - t0)
+
+
+_background_started = False
+_background_lock = threading.Lock()
+
+
+def _start_background() -> None:
+    """
+    Start the warm-up thread and the refresher, once per process.
+    """
+    global _background_started
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+    if WARMUP:
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    REFRESHER.start()
+
+
+@asynccontextmanager
+async def _lifespan(server: FastMCP):
+    # Entered per session: once over stdio, but per connection (SSE) or even
+    # per request (stateless HTTP) on the network transports, so background
+    # work is process-wide and outlives it.
+    _start_background()
+    yield {}
+
+
 # ─── MCP Server ────────────────────────────────────────────────────────────
-mcp = FastMCP("polymarket")
-
-
-# ─── CLOB API Client Helper ────────────────────────────────────────────────
-def _new_clob() -> ClobClient:
-    host = os.getenv("CLOB_HOST", "https://clob.polymarket.com")
-    key = os.getenv("PK", "")
-    api_key = os.getenv("CLOB_API_KEY", "")
-    api_secret = os.getenv("CLOB_SECRET", "")
-    passph = os.getenv("CLOB_PASS_PHRASE", "")
-    client = ClobClient(host, key=key, chain_id=POLYGON)
-    client.set_api_creds(
-        {
-            "apiKey": api_key,
-            "secret": api_secret,
-            "passphrase": passph,
-        }
-    )
-    return client
+mcp = FastMCP("polymarket", lifespan=_lifespan)
 
 
-# Shared CLOB client instance (used for synchronous calls)
-client = _new_clob()
+# ─── Concurrency ───────────────────────────────────────────────────────────
+# Every tool is async and the event loop only ever waits: Chroma, SQLite, the
+# embedding model and NumPy work run on this bounded thread pool, model fits
+# on forecasting's process pool.
+BLOCKING_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BLOCKING_WORKERS", "8")),
+    thread_name_prefix="blocking",
+)
 
-# ─── Chroma Vector DB Setup ────────────────────────────────────────────────
-CHROMA_DIR = os.getenv("CHROMA_PERSIST_DIR", ".chroma")
-chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
-ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-mpnet-base-v2"
+
+async def _blocking(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run `fn(*args)` on the blocking pool without holding up the event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(BLOCKING_POOL, fn, *args)
+
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, n = item.split("=", 1)
+            limits[name.strip()] = int(n)
+    return limits
+
+
+# Calls of one tool that may run at once; further calls queue, so a burst of
+# forecasts cannot take every worker away from searches and orderbooks.
+# Override per tool with TOOL_CONCURRENCY_LIMITS="tool_name=n,...".
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "8"))
+TOOL_LIMITS = {
+    "forecast_scenario_probabilities": 2,
+    "forecast_scenario_probabilities_batch": 1,
+    **_parse_limits(os.getenv("TOOL_CONCURRENCY_LIMITS", "")),
+}
+
+
+def limit_concurrency(fn: Callable) -> Callable:
+    """
+    Cap concurrent calls of an async tool at its `TOOL_LIMITS` entry and
+    record the time calls spend queued. Apply below `instrument_tool`.
+    """
+    name = fn.__name__
+    limit = TOOL_LIMITS.get(name, TOOL_CONCURRENCY)
+    # Semaphores belong to the loop that created them; rebuilt per loop.
+    loop, semaphore = None, None
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        nonlocal loop, semaphore
+        if loop is not asyncio.get_running_loop():
+            loop, semaphore = asyncio.get_running_loop(), asyncio.Semaphore(limit)
+        t0 = time.perf_counter()
+        async with semaphore:
+            METRICS.observe("tool_queue_seconds", time.perf_counter() - t0, tool=name)
+            return await fn(*args, **kwargs)
+
+    return wrapper
+
+
+# ─── Market Cache ──────────────────────────────────────────────────────────
+MARKET_CACHE = MarketCache(
+    maxsize=int(os.getenv("MARKET_CACHE_SIZE", "2048")),
+    price_ttl=float(os.getenv("MARKET_PRICE_TTL", "15")),
+    static_ttl=float(os.getenv("MARKET_STATIC_TTL", "86400")),
 )
-collection = chroma_client.get_or_create_collection(
-    name="prediction_markets",
-    embedding_function=ef,
+# Short-lived REST book snapshots, also filled by the background refresher
+BOOK_CACHE = TTLCache(
+    maxsize=int(os.getenv("BOOK_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("BOOK_CACHE_TTL", "15")),
 )
+# Request counts per condition_id (decayed); the refresher keeps the top warm
+HOT_MARKETS = HotSet(half_life=float(os.getenv("HOT_MARKET_HALF_LIFE", "3600")))
+
+
+async def _aget_market(condition_id: str) -> Dict[str, Any]:
+    """
+    Full market payload (with live prices) through the shared cache.
+    """
+    m = MARKET_CACHE.get(condition_id)
+    if m is None:
+        m = await upstream.aget_json(f"/markets/{condition_id}")
+        MARKET_CACHE.put(m, condition_id)
+    return m
+
+
+async def _aget_market_static(condition_id: str) -> Dict[str, Any]:
+    """
+    Question and token_id → outcome mapping through the shared cache.
+    """
+    m = MARKET_CACHE.get_static(condition_id)
+    if m is None:
+        m = MARKET_CACHE.put_static(await _aget_market(condition_id), condition_id)
+    return m
 
 
 # ─── Live-fetch Helper ─────────────────────────────────────────────────────
-def fetch_market_by_id(condition_id: str) -> List[Dict[str, Any]]:
+async def fetch_market_by_id(condition_id: str) -> List[Dict[str, Any]]:
     try:
-        m = client.get_market(condition_id=condition_id)
+        m = await _aget_market(condition_id)
     except Exception as e:
         LOGGER.error("CLOB fetch failed for %s: %s", condition_id, e)
         return []
+    HOT_MARKETS.touch(condition_id)  # only ids that resolved
+
+    return [market_row(m)]
+
+
+# ─── Search Filters ────────────────────────────────────────────────────────
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+# How deep search results can be paged (`offset + n_results`): every hit up
+# to it is ranked per query, so it bounds the vector and keyword lookups.
+MAX_SEARCH_DEPTH = int(os.getenv("MAX_SEARCH_DEPTH", str(5 * MAX_PAGE_SIZE)))
+
+# Precomputed result rows written by index.py (see market_store.py)
+MARKET_STORE = MarketStore()
+
+
+def _date_bound(value: str) -> int:
+    ts = iso_to_ts(value)
+    if ts is None:
+        raise ValueError(f"Invalid ISO date: {value!r}")
+    return ts
+
+
+def _market_filter(
+    active: Optional[bool],
+    closed: Optional[bool],
+    min_volume: Optional[float],
+    end_ts_from: Optional[int],
+    end_ts_to: Optional[int],
+) -> Optional[Dict[str, Any]]:
+    """
+    Build a Chroma `where` clause; `end_ts` and `volume` are the numeric
+    fields `index.py` derives for range filters.
+    """
+    clauses: List[Dict[str, Any]] = []
+    if active is not None:
+        clauses.append({"active": active})
+    if closed is not None:
+        clauses.append({"closed": closed})
+    if min_volume is not None:
+        clauses.append({"volume": {"$gte": float(min_volume)}})
+    if end_ts_from is not None:
+        clauses.append({"end_ts": {"$gte": end_ts_from}})
+    if end_ts_to is not None:
+        clauses.append({"end_ts": {"$lte": end_ts_to}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
 
-    outcomes, prices = [], []
-    for tok in m.get("tokens", []):
-        out = tok.get("outcome")
-        pr = tok.get("price")
-        if out is None or pr is None:
-            continue
-        outcomes.append(out)
-        try:
-            prices.append(float(pr))
-        except (TypeError, ValueError):
-            prices.append(None)
 
+# ─── Search Helpers ────────────────────────────────────────────────────────
+# BM25 keyword index written by index.py (see lexical.py)
+LEXICAL_INDEX = LexicalIndexFile()
+
+# Query text -> embedding; agents repeat and rephrase searches within a session
+QUERY_EMBEDDINGS = TTLCache(
+    maxsize=int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "86400")),
+)
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _embed_queries(queries: List[str]) -> List[List[float]]:
+    """
+    Query embeddings through an LRU cache keyed by normalized query text.
+    Cache misses are encoded together in a single model call.
+    """
+    keys = [_normalize_query(q) for q in queries]
+    vectors = {k: QUERY_EMBEDDINGS.get(k) for k in set(keys)}
+    missing = [k for k, v in vectors.items() if v is None]
+    if missing:
+        _collection()  # loads the embedding model
+        with METRICS.stage("embedding"):
+            encoded = _ef(missing)
+        for k, v in zip(missing, encoded):
+            vectors[k] = [float(x) for x in v]
+            QUERY_EMBEDDINGS.set(k, vectors[k])
+    return [vectors[k] for k in keys]
+
+
+def _vector_ids(
+    queries: List[str], n: int, where: Optional[Dict[str, Any]]
+) -> List[List[str]]:
+    embeddings = _embed_queries(queries)
+    with METRICS.stage("chroma_query"):
+        resp = _collection().query(
+            query_embeddings=embeddings,
+            n_results=n,
+            where=where,
+            include=[],
+        )
+    return resp["ids"]
+
+
+def _search(
+    queries: List[str], want: int, filters: tuple, mode: str
+) -> List[List[Dict[str, Any]]]:
+    """
+    Top `want` rows per query. Keyword hits come from the lexical index;
+    queries that still need vector search share one batched Chroma query.
+    `filters` is (active, closed, min_volume, end_ts_from, end_ts_to).
+    """
+    lexical = LEXICAL_INDEX.get() if mode in ("lexical", "hybrid") else None
+    rankings: List[List[str]] = [[] for _ in queries]
+    lex_ids: List[Optional[List[str]]] = [None] * len(queries)
+    need_vector = []
+    for i, q in enumerate(queries):
+        if lexical is not None:
+            # Keyword hits are filtered after the fact, so over-fetch a little
+            with METRICS.stage("lexical_search"):
+                lex_ids[i] = [cid for cid, _ in lexical.search(q, k=want * 3)]
+            if mode == "lexical" or lexical.exact_matches(q):
+                rankings[i] = lex_ids[i]
+                continue
+        need_vector.append(i)
+
+    if need_vector:
+        vec = _vector_ids(
+            [queries[i] for i in need_vector], want, _market_filter(*filters)
+        )
+        for i, ids in zip(need_vector, vec):
+            rankings[i] = rrf([ids, lex_ids[i]]) if lex_ids[i] is not None else ids
+
+    all_ids = list(dict.fromkeys(cid for r in rankings for cid in r))
+    rows = {r["condition_id"]: r for r in _rows_for_ids(all_ids)}
     return [
-        {
-            "condition_id": m.get("condition_id"),
-            "question_id": m.get("question_id"),
-            "slug": m.get("market_slug"),
-            "question": m.get("question"),
-            "description": m.get("description", ""),
-            "outcomes": outcomes,
-            "prices": prices,
-            "volume": m.get("volume"),
-            "active": m.get("active"),
-            "closed": m.get("closed"),
-            "startDate": m.get("game_start_time") or m.get("start_date_iso"),
-            "endDate": m.get("end_date_iso"),
-        }
+        [
+            rows[cid]
+            for cid in ranking
+            if cid in rows and _row_matches(rows[cid], *filters)
+        ][:want]
+        for ranking in rankings
     ]
 
 
+def _rows_for_ids(ids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Result rows for `ids`, in order, gathered from the precomputed market
+    store. Anything missing there falls back to decoding Chroma metadata.
+    Every hit also seeds the market cache's token mapping.
+    """
+    with METRICS.stage("store_records"):
+        records = MARKET_STORE.records(ids)
+    missing = [cid for cid in ids if cid not in records]
+    metas: Dict[str, Dict[str, Any]] = {}
+    if missing:
+        with METRICS.stage("chroma_get"):
+            got = _collection().get(ids=missing, include=["metadatas"])
+        metas = dict(zip(got["ids"], got["metadatas"]))
+
+    results = []
+    for cid in ids:
+        rec = records.get(cid)
+        if rec is not None:
+            MARKET_CACHE.seed_tokens(
+                cid, rec["question"], rec["token_ids"], rec["token_outcomes"]
+            )
+            results.append({k: rec[k] for k in ROW_FIELDS})
+        elif cid in metas:
+            MARKET_CACHE.seed(cid, metas[cid])
+            results.append(market_row(metas[cid], cid))
+    return results
+
+
+def _list_page(
+    filters: tuple, sort_by: Optional[str], descending: bool, limit: int, offset: int
+) -> List[Dict[str, Any]]:
+    """
+    One page of the market listing, from the side-store when it exists.
+    """
+    if MARKET_STORE.table() is not None:
+        with METRICS.stage("store_select"):
+            return MARKET_STORE.select(
+                *filters,
+                sort_by=sort_by,
+                descending=descending,
+                limit=limit,
+                offset=offset,
+            )
+    if sort_by is not None:
+        raise ValueError(
+            "sort_by needs the market side-store; install pyarrow and re-run "
+            "index.py to publish it"
+        )
+    with METRICS.stage("chroma_get"):
+        page = _collection().get(
+            where=_market_filter(*filters),
+            limit=limit,
+            offset=offset,
+            include=["metadatas"],
+        )
+    return [market_row(m, cid) for cid, m in zip(page["ids"], page["metadatas"])]
+
+
+def _row_matches(
+    row: Dict[str, Any],
+    active: Optional[bool],
+    closed: Optional[bool],
+    min_volume: Optional[float],
+    end_ts_from: Optional[int],
+    end_ts_to: Optional[int],
+) -> bool:
+    """
+    Python-side twin of `_market_filter`, for keyword hits.
+    """
+    if active is not None and row["active"] is not active:
+        return False
+    if closed is not None and row["closed"] is not closed:
+        return False
+    if min_volume is not None and (row["volume"] or 0) < min_volume:
+        return False
+    if end_ts_from is not None or end_ts_to is not None:
+        end_ts = iso_to_ts(row["endDate"])
+        if end_ts is None:
+            return False
+        if end_ts_from is not None and end_ts < end_ts_from:
+            return False
+        if end_ts_to is not None and end_ts > end_ts_to:
+            return False
+    return True
+
+
 # ─── MCP Tools ─────────────────────────────────────────────────────────────
 
 
 @mcp.tool()
-def list_all_prediction_markets(
-    query: Optional[str] = None, condition_id: Optional[str] = None
+@instrument_tool
+@limit_concurrency
+async def list_all_prediction_markets(
+    query: Optional[str] = None,
+    condition_id: Optional[str] = None,
+    n_results: int = 10,
+    limit: int = 50,
+    offset: int = 0,
+    active: Optional[bool] = None,
+    closed: Optional[bool] = None,
+    min_volume: Optional[float] = None,
+    end_date_from: Optional[str] = None,
+    end_date_to: Optional[str] = None,
+    sort_by: Optional[str] = None,
+    descending: bool = True,
+    mode: str = "hybrid",
 ) -> List[Dict[str, Any]]:
+    """
+    Search prediction markets by text, or look one up by condition_id.
+
+    With a `query`, returns the `n_results` closest markets (skipping the
+    first `offset`; `offset + n_results` may be at most MAX_SEARCH_DEPTH,
+    1000 by default). Without one, lists markets a page at a time: `limit`
+    rows starting at `offset`. Both modes accept filters on `active`,
+    `closed`, `min_volume` and an end-date range (`end_date_from` /
+    `end_date_to`, ISO dates such as "2025-12-31"). Listings can be sorted
+    by `sort_by="volume"` or `"end_date"` (`descending` by default).
+
+    `mode` picks the search strategy: "vector" (semantic), "lexical"
+    (keyword/BM25, best for slugs, tickers and names) or "hybrid" (both,
+    merged by reciprocal-rank fusion; exact slug/question matches are
+    answered from the keyword index alone).
+    """
     HEX_RE = re.compile(r"^0x[0-9a-fA-F]{64}$")
     effective_id = condition_id or (query if HEX_RE.match(query or "") else None)
     if effective_id:
-        return fetch_market_by_id(effective_id)
+        return await fetch_market_by_id(effective_id)
 
-    if query:
-        resp = collection.query(
-            query_texts=[query], n_results=10, include=["metadatas"]
-        )
-        metas = resp["metadatas"][0]
-        ids = resp["ids"][0]
-    else:
-        all_ = collection.get(include=["metadatas"])
-        metas = all_["metadatas"]
-        ids = all_["ids"]
+    end_ts_from = _date_bound(end_date_from) if end_date_from else None
+    end_ts_to = _date_bound(end_date_to) if end_date_to else None
+    offset = max(0, offset)
+    filters = (active, closed, min_volume, end_ts_from, end_ts_to)
 
-    results = []
-    for cid, m in zip(ids, metas):
-        raw_tokens = m.get("tokens", [])
-        if isinstance(raw_tokens, str):
-            try:
-                tok_list = json.loads(raw_tokens)
-            except json.JSONDecodeError:
-                tok_list = []
-        else:
-            tok_list = raw_tokens
-
-        outcomes, prices = [], []
-        for tok in tok_list:
-            out = tok.get("outcome")
-            pr = tok.get("price")
-            if out and pr:
-                outcomes.append(out)
-                try:
-                    prices.append(float(pr))
-                except:
-                    prices.append(None)
-
-        results.append(
-            {
-                "condition_id": cid,
-                "question_id": m.get("question_id", ""),
-                "slug": m.get("market_slug", ""),
-                "question": m.get("question", ""),
-                "description": m.get("description", ""),
-                "outcomes": outcomes,
-                "prices": prices,
-                "volume": m.get("volume"),
-                "active": m.get("active"),
-                "closed": m.get("closed"),
-                "startDate": m.get("game_start_time") or m.get("end_date_iso"),
-                "endDate": m.get("end_date_iso"),
-            }
+    if not query:
+        if sort_by is not None and sort_by not in SORT_COLUMNS:
+            raise ValueError(f"sort_by must be one of {sorted(SORT_COLUMNS)}")
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        return await _blocking(_list_page, filters, sort_by, descending, limit, offset)
+
+    n_results = max(1, min(n_results, MAX_PAGE_SIZE))
+    if offset + n_results > MAX_SEARCH_DEPTH:
+        raise ValueError(
+            f"offset + n_results must be at most {MAX_SEARCH_DEPTH} for a "
+            "search; narrow the query or filters instead"
         )
-    return results
+    hits = await _blocking(_search, [query], offset + n_results, filters, mode)
+    return hits[0][offset:]
 
 
 @mcp.tool()
-async def list_prediction_market_orderbooks(condition_ids: List[str]) -> Dict[str, Any]:
+@instrument_tool
+@limit_concurrency
+async def search_prediction_markets_batch(
+    queries: List[str],
+    n_results: int = 5,
+    active: Optional[bool] = None,
+    closed: Optional[bool] = None,
+    min_volume: Optional[float] = None,
+    end_date_from: Optional[str] = None,
+    end_date_to: Optional[str] = None,
+    mode: str = "hybrid",
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Search several queries at once (e.g. one per portfolio ticker).
+
+    All queries are embedded in one batched model call and sent to the
+    vector store as one request. Returns the top `n_results` markets per
+    query, keyed by query; filters and `mode` behave as in
+    `list_all_prediction_markets`.
+    """
+    n_results = max(1, min(n_results, MAX_PAGE_SIZE))
+    filters = (
+        active,
+        closed,
+        min_volume,
+        _date_bound(end_date_from) if end_date_from else None,
+        _date_bound(end_date_to) if end_date_to else None,
+    )
+    queries = list(dict.fromkeys(q for q in queries if q and q.strip()))
+    return dict(
+        zip(queries, await _blocking(_search, queries, n_results, filters, mode))
+    )
+
+
+BOOK_MIRROR = BookMirror()
+
+
+async def _aget_book(token_id: str) -> Dict[str, Any]:
+    """
+    Mirrored book of a subscribed token, else a (briefly cached) REST snapshot.
+    """
+    book = BOOK_MIRROR.book(token_id) or BOOK_CACHE.get(token_id)
+    if book is None:
+        book = await upstream.aget_json("/book", params={"token_id": token_id})
+        BOOK_CACHE.set(token_id, book)
+    return book
+
+
+async def _market_tokens(condition_ids: List[str]):
+    """
+    (token ids, {condition_id: error}) for the given markets.
+    """
+
+    async def tokens(cid):
+        try:
+            market = await _aget_market_static(cid)
+            return cid, [tok["token_id"] for tok in market.get("tokens", [])], None
+        except Exception as e:
+            return cid, [], str(e)
+
+    token_ids, errors = [], {}
+    for cid, tids, error in await asyncio.gather(*(tokens(c) for c in condition_ids)):
+        token_ids.extend(tids)
+        if error is not None:
+            errors[cid] = error
+    return token_ids, errors
+
+
+@mcp.tool()
+@instrument_tool
+@limit_concurrency
+async def subscribe_prediction_market_orderbooks(
+    condition_ids: List[str],
+) -> Dict[str, Any]:
+    """
+    Mirror the live orderbooks of these markets in memory over the CLOB
+    websocket; `list_prediction_market_orderbooks` then answers them without
+    REST calls.
+    """
+    token_ids, errors = await _market_tokens(condition_ids)
+    BOOK_MIRROR.subscribe(token_ids)
+    return {"subscribed_tokens": len(BOOK_MIRROR.subscribed()), "errors": errors}
+
+
+@mcp.tool()
+@instrument_tool
+@limit_concurrency
+async def unsubscribe_prediction_market_orderbooks(
+    condition_ids: List[str],
+) -> Dict[str, Any]:
+    """
+    Stop mirroring the orderbooks of these markets.
+    """
+    token_ids, errors = await _market_tokens(condition_ids)
+    BOOK_MIRROR.unsubscribe(token_ids)
+    return {"subscribed_tokens": len(BOOK_MIRROR.subscribed()), "errors": errors}
+
+
+@mcp.tool()
+@instrument_tool
+@limit_concurrency
+async def list_prediction_market_orderbooks(
+    condition_ids: List[str],
+    depth: Optional[int] = None,
+    bucket: Optional[float] = None,
+    within_cents: float = 5,
+    format: str = "levels",
+) -> Dict[str, Any]:
     """
     Async fetch multiple orderbooks concurrently by condition_ids.
+
+    Markets and their per-token books are fetched in parallel over the shared
+    upstream client; books of subscribed markets are read from the websocket
+    mirror instead. A market that fails to load is reported as
+    `{"error": ...}` without affecting the rest of the batch.
+
+    Every outcome carries best bid/ask, spread, mid, microprice, the size
+    within `within_cents` of the mid per side and its imbalance. Levels are
+    best first; `bucket` (e.g. 0.01) aggregates them into price buckets,
+    `depth` keeps the best N per side, and `format` is "levels", "arrays"
+    (parallel float lists) or "summary" (stats only).
     """
-    client = _new_clob()
+    check_shape(depth, bucket)
 
     async def fetch_orderbook(cid):
-        market = client.get_market(condition_id=cid)
-        orderbooks = {}
-        for tok in market.get("tokens", []):
-            tid, outcome = tok["token_id"], tok["outcome"]
-            book = client.get_order_book(token_id=tid)
-            bids = [{"price": lvl.price, "size": lvl.size} for lvl in book.bids]
-            asks = [{"price": lvl.price, "size": lvl.size} for lvl in book.asks]
-            best_bid = float(bids[0]["price"]) if bids else None
-            best_ask = float(asks[0]["price"]) if asks else None
-            orderbooks[outcome] = {
-                "best_bid": best_bid,
-                "best_ask": best_ask,
-                "spread": best_ask - best_bid if best_bid and best_ask else None,
-                "bids": bids,
-                "asks": asks,
-            }
+        try:
+            market = await _aget_market_static(cid)
+            HOT_MARKETS.touch(cid)
+            tokens = market.get("tokens", [])
+            books = await asyncio.gather(
+                *(_aget_book(tok["token_id"]) for tok in tokens)
+            )
+        except Exception as e:
+            LOGGER.error("Orderbook fetch failed for %s: %s", cid, e)
+            return cid, {"error": str(e)}
+
+        orderbooks = {
+            tok["outcome"]: shape_book(book, depth, bucket, within_cents, format)
+            for tok, book in zip(tokens, books)
+        }
         return cid, {
             "question": market.get("question", ""),
             "orderbooks": orderbooks,
@@ -195,121 +666,448 @@ async def list_prediction_market_orderbooks(condition_ids: List[str]) -> Dict[st
     return {cid: data for cid, data in results}
 
 
-def _fetch_interval(
+# ─── Price History ─────────────────────────────────────────────────────────
+VALID_INTERVALS = ["max", "1m", "1w", "1d", "6h", "1h"]
+HISTORY_FIDELITY = 50  # minutes per point of the series forecasts (and refreshes) use
+
+# Keyed on (token_id, interval, fidelity, start_ts, end_ts)
+HISTORY_CACHE = TTLCache(
+    maxsize=int(os.getenv("HISTORY_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("HISTORY_CACHE_TTL", "60")),
+)
+
+
+INTERVAL_SECONDS = {
+    "1m": 30 * 86400,
+    "1w": 7 * 86400,
+    "1d": 86400,
+    "6h": 6 * 3600,
+    "1h": 3600,
+}
+HISTORY_STORE_ENABLED = bool(history_store.STORE_DIR)
+_history_store_obj: Optional[PriceHistoryStore] = None
+_history_store_lock = threading.Lock()
+
+
+def _history_store() -> PriceHistoryStore:
+    """
+    Open the local price-history store on first use.
+    """
+    global _history_store_obj
+    if _history_store_obj is None:
+        with _history_store_lock:
+            if _history_store_obj is None:
+                _history_store_obj = PriceHistoryStore()
+    return _history_store_obj
+
+
+# A sync request: (query parameters, `since` to record for what it returns)
+Sync = Tuple[Dict[str, Any], Optional[int]]
+
+
+def _history_due(token_id: str, fidelity: int) -> bool:
+    since, _, synced_at = _history_store().state(token_id, fidelity)
+    return since is not None and time.time() - synced_at >= history_store.SYNC_INTERVAL
+
+
+def _sync_requests(token_id: str, fidelity: int, start_ts: Optional[int]) -> List[Sync]:
+    """
+    Requests that make the stored series cover `start_ts` (None: the whole
+    history) up to now. A new series fetches just that window; a stored one
+    gets the points before its range when a wider window is asked for, and
+    those after its last point unless it was synced recently.
+    """
+    since, last_t, synced_at = _history_store().state(token_id, fidelity)
+    now = int(time.time())
+    base = {"market": token_id, "fidelity": fidelity}
+    whole = ({**base, "interval": "max"}, 0)
+    if since is None:
+        return [
+            whole if start_ts is None else ({**base, "startTs": start_ts}, start_ts)
+        ]
+    if start_ts is None and since > 0:
+        return [whole]  # covers the tail too
+    requests: List[Sync] = []
+    if start_ts is not None and start_ts < since:
+        requests.append(({**base, "startTs": start_ts, "endTs": since}, start_ts))
+    if time.time() - synced_at >= history_store.SYNC_INTERVAL:
+        tail = since if last_t is None else last_t + 1
+        requests.append(({**base, "startTs": tail, "endTs": now}, None))
+    return requests
+
+
+def _sync_history(token_id: str, fidelity: int) -> None:
+    # Refresher step: the tail of a stored series only, never a backfill
+    for params, since in _sync_requests(token_id, fidelity, int(time.time())):
+        h = upstream.get_json("/prices-history", params=params).get("history", [])
+        _history_store().append(token_id, fidelity, h, since)
+
+
+async def _async_history(token_id: str, fidelity: int, start_ts: Optional[int]) -> None:
+    for params, since in await _blocking(_sync_requests, token_id, fidelity, start_ts):
+        resp = await upstream.aget_json("/prices-history", params=params)
+        await _blocking(
+            _history_store().append, token_id, fidelity, resp.get("history", []), since
+        )
+
+
+def _read_history(
+    token_id: str, fidelity: int, start_ts: Optional[int], end_ts: Optional[int]
+) -> List[Dict[str, Any]]:
+    with METRICS.stage("history_store_read"):
+        return _history_store().read(token_id, fidelity, start_ts, end_ts)
+
+
+async def _fetch_history(
+    token_id: str,
+    interval: str,
+    fidelity: int,
+    start_ts: Optional[int],
+    end_ts: Optional[int],
+) -> List[Dict[str, Any]]:
+    key = (token_id, interval, fidelity, start_ts, end_ts)
+    cached = HISTORY_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    if HISTORY_STORE_ENABLED:
+        if not start_ts and not end_ts and interval in INTERVAL_SECONDS:
+            start_ts = int(time.time()) - INTERVAL_SECONDS[interval]
+        await _async_history(token_id, fidelity, start_ts or None)
+        h = await _blocking(_read_history, token_id, fidelity, start_ts, end_ts)
+        HISTORY_CACHE.set(key, h)
+        return h
+
+    params = {"market": token_id, "fidelity": fidelity}
+    if start_ts:
+        params["startTs"] = start_ts
+    if end_ts:
+        params["endTs"] = end_ts
+    if not start_ts and not end_ts:
+        params["interval"] = interval
+
+    h = (await upstream.aget_json("/prices-history", params=params)).get("history", [])
+    HISTORY_CACHE.set(key, h)
+    return h
+
+
+async def _fetch_interval(
     condition_id: str,
     interval: str,
     fidelity: int,
     start_ts: Optional[int],
     end_ts: Optional[int],
 ) -> Dict[str, Any]:
-    CLOB = "https://clob.polymarket.com"
-    m = requests.get(f"{CLOB}/markets/{condition_id}").json()
-    raw, all_ts = {}, set()
-
-    for tok in m.get("tokens", []):
-        tid, outcome = tok["token_id"], tok["outcome"]
-        params = {"market": tid, "fidelity": fidelity}
-        if start_ts:
-            params["startTs"] = start_ts
-        if end_ts:
-            params["endTs"] = end_ts
-        if not start_ts and not end_ts:
-            params["interval"] = interval
-
-        h = (
-            requests.get(f"{CLOB}/prices-history", params=params)
-            .json()
-            .get("history", [])
+    """
+    Outcome prices aligned on one timestamp index, as NumPy arrays.
+    """
+    m = await _aget_market_static(condition_id)
+    HOT_MARKETS.touch(condition_id)
+    tokens = m.get("tokens", [])
+    fetched = await asyncio.gather(
+        *(
+            _fetch_history(tok["token_id"], interval, fidelity, start_ts, end_ts)
+            for tok in tokens
         )
-        raw[outcome] = {pt["t"]: pt["p"] for pt in h}
-        all_ts.update(raw[outcome].keys())
-
-    ts_sorted = sorted(all_ts)
+    )
+    histories = {tok["outcome"]: h for tok, h in zip(tokens, fetched)}
+    timestamps, series = await _blocking(align, histories)
     return {
         "condition_id": condition_id,
         "question": m.get("question", ""),
-        "timestamps": ts_sorted,
-        "series": {o: [raw[o].get(ts) for ts in ts_sorted] for o in raw},
+        "timestamps": timestamps,
+        "series": series,
         "interval": interval,
     }
 
 
 @mcp.tool()
-def list_prediction_market_graph(
+@instrument_tool
+@limit_concurrency
+async def list_prediction_market_graph(
     condition_id: str,
     interval: str = "max",
     fidelity: int = 50,
     start_ts: Optional[int] = None,
     end_ts: Optional[int] = None,
+    max_points: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
-    VALID = ["max", "1m", "1w", "1d", "6h", "1h"]
-    graphs = {
-        iv: _fetch_interval(condition_id, iv, fidelity, start_ts, end_ts)
-        for iv in VALID
+    """
+    Yes/No price history of a market. `max_points` downsamples long series
+    (LTTB on the Yes series), keeping the shape of the chart.
+    """
+    if interval not in VALID_INTERVALS:
+        interval = "1d"
+    data = await _fetch_interval(condition_id, interval, fidelity, start_ts, end_ts)
+    return [await _blocking(_graph, data, max_points)]
+
+
+def _graph(data: Dict[str, Any], max_points: Optional[int]) -> Dict[str, Any]:
+    ts = data["timestamps"]
+    empty = np.zeros(0)
+    yes, no = data["series"].get("Yes", empty), data["series"].get("No", empty)
+    # Downsample on Yes, else on whichever outcome series the market has
+    guide = next(
+        (y for y in (yes, no, *data["series"].values()) if len(y) == len(ts)), None
+    )
+    if max_points and len(ts) > max_points and guide is not None:
+        keep = lttb(ts, guide, max_points)
+        ts = ts[keep]
+        yes, no = (yes[keep] if len(yes) else yes), (no[keep] if len(no) else no)
+    return {
+        "condition_id": data["condition_id"],
+        "question": data["question"],
+        "timestamps": ts.tolist(),
+        "yes": to_list(yes),
+        "no": to_list(no),
     }
-    data = graphs.get(interval, graphs["1d"])
-    return [
-        {
-            "condition_id": data["condition_id"],
-            "question": data["question"],
-            "timestamps": data["timestamps"],
-            "yes": data["series"].get("Yes", []),
-            "no": data["series"].get("No", []),
-        }
-    ]
 
 
 @mcp.tool()
-def forecast_scenario_probabilities(
-    condition_id: str, time_horizons_days: List[int] = [1, 7, 30, 90, 180, 365]
+@instrument_tool
+@limit_concurrency
+async def forecast_scenario_probabilities(
+    condition_id: str,
+    time_horizons_days: List[int] = [1, 7, 30, 90, 180, 365],
+    selection: str = "aic",
 ) -> List[Dict[str, Any]]:
+    """
+    ARIMA forecast of the Yes probability. `selection="fast"` fixes the
+    differencing order with a stationarity test and fits half the candidates.
+    """
     try:
-        hist_data = list_prediction_market_graph(condition_id=condition_id)
-        if not hist_data or not hist_data[0].get("yes"):
+        data = await _fetch_interval(condition_id, "max", HISTORY_FIDELITY, None, None)
+        yes = data["series"].get("Yes")
+        if yes is None or not len(yes):
             return []
-
-        data = hist_data[0]
-        series = pd.Series(
-            data["yes"], index=pd.to_datetime(data["timestamps"], unit="s")
+        return await _blocking(
+            _forecast,
+            condition_id,
+            data["timestamps"],
+            yes,
+            selection,
+            time_horizons_days,
         )
-        daily_series = series.resample("D").last().ffill()
-
-        if len(daily_series) < 10:
-            return []
-
-        best_aic, best_order = np.inf, (1, 1, 1)
-        for p in range(2):
-            for d in range(2):
-                for q in range(2):
-                    try:
-                        model = ARIMA(daily_series, order=(p, d, q))
-                        model_fit = model.fit()
-                        if model_fit.aic < best_aic:
-                            best_aic, best_order = model_fit.aic, (p, d, q)
-                    except:
-                        continue
-
-        model = ARIMA(daily_series, order=best_order).fit()
-        forecast = model.get_forecast(steps=max(time_horizons_days))
-
-        return [
-            {
-                "horizon_days": days,
-                "yes_probability": round(float(forecast.predicted_mean[days - 1]), 3),
-                "no_probability": round(
-                    1 - float(forecast.predicted_mean[days - 1]), 3
-                ),
-            }
-            for days in time_horizons_days
-            if days <= len(forecast.predicted_mean)
-        ]
 
     except Exception as e:
         LOGGER.error(f"Forecast failed: {str(e)}", exc_info=True)
         return []
 
 
+def _forecast(
+    condition_id: str,
+    ts: np.ndarray,
+    yes: np.ndarray,
+    selection: str,
+    horizons: List[int],
+) -> List[Dict[str, Any]]:
+    with METRICS.stage("model_fit"):
+        model = forecasting.fitted_model(condition_id, ts, yes, selection)
+    if model is None:
+        return []
+    return forecasting.forecast(model, horizons)
+
+
+@mcp.tool()
+@instrument_tool
+@limit_concurrency
+async def forecast_scenario_probabilities_batch(
+    condition_ids: List[str],
+    time_horizons_days: List[int] = [1, 7, 30, 90, 180, 365],
+    selection: str = "aic",
+) -> Dict[str, Dict[str, Any]]:
+    """
+    `forecast_scenario_probabilities` for many markets: histories are fetched
+    concurrently and the model fits run on the forecasting pool, one market
+    per worker. Each result carries its own timings and, on failure, "error".
+    """
+    t0 = time.perf_counter()
+
+    async def fetch(cid: str):
+        start = time.perf_counter()
+        try:
+            data = await _fetch_interval(cid, "max", HISTORY_FIDELITY, None, None)
+            return cid, data, time.perf_counter() - start, None
+        except Exception as e:
+            return cid, None, time.perf_counter() - start, str(e)
+
+    fetched = await asyncio.gather(*(fetch(cid) for cid in condition_ids))
+
+    results: Dict[str, Dict[str, Any]] = {}
+    series = {}
+    for cid, data, seconds, error in fetched:
+        results[cid] = {
+            "forecasts": [],
+            "fetch_seconds": round(seconds, 3),
+            "fit_seconds": 0.0,
+        }
+        if error is not None:
+            results[cid]["error"] = error
+            continue
+        yes = data["series"].get("Yes")
+        if yes is not None and len(yes):
+            series[cid] = (data["timestamps"], yes)
+
+    def fit_and_forecast() -> None:
+        # Runs on the blocking pool: the fits wait on the forecasting pool and
+        # the forecasts themselves are statsmodels work.
+        with METRICS.stage("model_fit_batch"):
+            fits = forecasting.fitted_models(series, selection)
+        for cid, fit in fits.items():
+            results[cid]["fit_seconds"] = fit["fit_seconds"]
+            if "error" in fit:
+                results[cid]["error"] = fit["error"]
+            elif fit["model"] is not None:
+                try:
+                    results[cid]["forecasts"] = forecasting.forecast(
+                        fit["model"], time_horizons_days
+                    )
+                except Exception as e:
+                    results[cid]["error"] = str(e)
+
+    await _blocking(fit_and_forecast)
+
+    LOGGER.info(
+        "Forecast %d markets in %.2fs", len(condition_ids), time.perf_counter() - t0
+    )
+    return results
+
+
+# ─── Background Refresh ────────────────────────────────────────────────────
+def _refresh_book(token_id: str) -> None:
+    BOOK_CACHE.set(token_id, upstream.get_json("/book", params={"token_id": token_id}))
+
+
+def _refresh_plan(condition_id: str) -> Plan:
+    """
+    Market payload, REST books of unmirrored tokens and, when due, the tail of
+    each token's price history; one upstream request per step.
+    """
+
+    def market():
+        MARKET_CACHE.put(upstream.get_json(f"/markets/{condition_id}"), condition_id)
+
+    steps: Plan = [(1, market)]
+    static = MARKET_CACHE.get_static(condition_id) or {}
+    for tok in static.get("tokens", []):
+        tid = tok["token_id"]
+        if BOOK_MIRROR.book(tid) is None:
+            steps.append((1, functools.partial(_refresh_book, tid)))
+        if HISTORY_STORE_ENABLED and _history_due(tid, HISTORY_FIDELITY):
+            steps.append((1, functools.partial(_sync_history, tid, HISTORY_FIDELITY)))
+    return steps
+
+
+REFRESHER = Refresher(
+    HOT_MARKETS,
+    _refresh_plan,
+    size=int(os.getenv("HOT_MARKET_COUNT", "10")),
+    interval=float(os.getenv("REFRESH_INTERVAL", "10")),
+    budget=int(os.getenv("REFRESH_BUDGET", "60")),
+)
+# Refreshed entries must outlive the gap to the next cycle, with some slack.
+if REFRESHER.interval > 0.8 * min(BOOK_CACHE.ttl, MARKET_CACHE.markets.ttl):
+    LOGGER.warning(
+        "REFRESH_INTERVAL (%gs) is close to BOOK_CACHE_TTL / MARKET_PRICE_TTL; "
+        "hot markets may expire between refreshes",
+        REFRESHER.interval,
+    )
+
+
+# ─── Instrumentation ───────────────────────────────────────────────────────
+for _name, _cache in (
+    ("market", MARKET_CACHE.markets),
+    ("market_static", MARKET_CACHE.static),
+    ("market_seeded", MARKET_CACHE.seeded),
+    ("book", BOOK_CACHE),
+    ("history", HISTORY_CACHE),
+    ("query_embedding", QUERY_EMBEDDINGS),
+    ("forecast_model", forecasting.MODEL_CACHE),
+):
+    METRICS.register_cache(_name, _cache.stats)
+
+
+@mcp.tool()
+async def server_stats(format: str = "json") -> Union[Dict[str, Any], str]:
+    """
+    Server instrumentation: per-tool and per-stage latency (p50/p95/p99),
+    upstream requests by route and status, bytes received, cache hit
+    ratios, response payload sizes and background task state.
+    `format="prometheus"` returns the Prometheus text exposition instead.
+    """
+    if format == "prometheus":
+        return METRICS.prometheus()
+    stats = METRICS.snapshot()
+    stats["upstream"] = upstream.FLIGHTS.stats()
+    stats["orderbook_mirror"] = BOOK_MIRROR.stats()
+    stats["refresher"] = REFRESHER.stats()
+    return stats
+
+
+# ─── Network Transport ─────────────────────────────────────────────────────
+# One shared server for many clients: the embedding model, Chroma handle and
+# caches are loaded once per worker process instead of once per agent.
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
+MCP_PORT = int(os.getenv("MCP_PORT", "8000"))
+MCP_WORKERS = int(os.getenv("MCP_WORKERS", "1"))
+# Sessions live in worker memory, so several workers need stateless requests.
+MCP_STATELESS_HTTP = os.getenv("MCP_STATELESS_HTTP", "0") != "0"
+
+
+def http_app():
+    """
+    Streamable HTTP ASGI app (served at `/mcp`), built in each worker process
+    (`uvicorn server:http_app --factory`). Workers share the read-only Chroma
+    store, market side-store and lexical index on disk; run `index.py`
+    separately to update them.
+    """
+    mcp.settings.stateless_http = MCP_STATELESS_HTTP
+    _start_background()
+    return mcp.streamable_http_app()
+
+
 # ─── Launch ────────────────────────────────────────────────────────────────
 if __name__ == "__main__":
-    LOGGER.info("🚀 Starting MCP server ...")
-    mcp.run(transport="stdio")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Polymarket MCP server")
+    parser.add_argument(
+        "--transport",
+        default=MCP_TRANSPORT,
+        choices=["stdio", "sse", "streamable-http"],
+    )
+    parser.add_argument("--host", default=MCP_HOST)
+    parser.add_argument("--port", type=int, default=MCP_PORT)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MCP_WORKERS,
+        help="worker processes (streamable-http only; implies stateless requests)",
+    )
+    args = parser.parse_args()
+    if args.workers > 1 and args.transport != "streamable-http":
+        parser.error("--workers needs --transport streamable-http")
+
+    LOGGER.info("🚀 Starting MCP server (%s) ...", args.transport)
+    if args.transport == "stdio":
+        mcp.run(transport="stdio")
+    else:
+        import uvicorn
+
+        if args.workers > 1:
+            # Workers import this module afresh and read their settings from
+            # the environment.
+            os.environ["MCP_STATELESS_HTTP"] = "1"
+            app = "server:http_app"
+        else:
+            _start_background()
+            app = http_app() if args.transport == "streamable-http" else mcp.sse_app()
+        uvicorn.run(
+            app,
+            host=args.host,
+            port=args.port,
+            workers=args.workers if args.workers > 1 else None,
+            factory=args.workers > 1,
+            log_level="info",
+        )
@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import upstream
+import book_mirror
+from book_mirror import BookMirror
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from orderbook_mirror import (  # noqa: E402
+    FakeMarketChannel,
+    in_sync,
+    start_rest_server,
+    start_server,
+)
+
+RECORDING = os.path.join(os.path.dirname(__file__), "fixtures", "market_channel.jsonl")
+
+
+def recorded_assets():
+    with open(RECORDING) as f:  # the recording opens with the snapshots
+        return [ev["asset_id"] for ev in json.loads(f.readline())]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail("timed out")
+        time.sleep(0.01)
+
+
+def mirror_replay(monkeypatch, resnapshot):
+    channel = FakeMarketChannel(RECORDING, drop_every=25, resnapshot=resnapshot)
+    port = free_port()
+    start_server(channel, port)
+    monkeypatch.setattr(upstream, "CLOB_HOST", start_rest_server(channel))
+    monkeypatch.setattr(book_mirror, "SNAPSHOT_GRACE", 0.2)
+
+    assets = recorded_assets()
+    mirror = BookMirror(url=f"ws://127.0.0.1:{port}")
+    mirror.subscribe(assets)
+    # The recording runs out on the second connection, which then stays idle.
+    wait_for(lambda: channel.connections >= 2 and channel.replayed)
+    wait_for(lambda: all(in_sync(mirror, channel, a) for a in assets))
+    return mirror
+
+
+def test_mirror_matches_server_after_reconnect(monkeypatch):
+    mirror = mirror_replay(monkeypatch, resnapshot=True)
+
+    stats = mirror.stats()
+    assert stats["reconnects"] >= 1
+    assert stats["resyncs"] == 0  # the reconnection's snapshots were enough
+
+
+def test_gap_is_repaired_from_rest(monkeypatch):
+    mirror = mirror_replay(monkeypatch, resnapshot=False)
+
+    stats = mirror.stats()
+    assert stats["reconnects"] >= 1
+    assert stats["resyncs"] == len(recorded_assets())
+
+
+def serve_ws(handler):
+    port = free_port()
+    start_server(SimpleNamespace(handler=handler), port)
+    return f"ws://127.0.0.1:{port}"
+
+
+def test_server_close_backs_off(monkeypatch):
+    attempts = []
+
+    def retry_delay(attempt):
+        attempts.append(attempt)
+        return 0.05
+
+    async def close_at_once(ws):
+        await ws.recv()  # the subscription
+
+    monkeypatch.setattr(upstream, "_retry_delay", retry_delay)
+    mirror = BookMirror(url=serve_ws(close_at_once))
+    mirror.subscribe(["tok"])
+    wait_for(lambda: mirror.stats()["reconnects"] >= 3)
+
+    # clean closes count as reconnects and back off with growing attempts
+    assert attempts[:3] == [0, 1, 2]
+
+
+def test_subscription_change_resubscribes_without_backoff():
+    subscriptions = []
+
+    async def stay_open(ws):
+        subscriptions.append(json.loads(await ws.recv())["assets_ids"])
+        await asyncio.Future()
+
+    mirror = BookMirror(url=serve_ws(stay_open))
+    mirror.subscribe(["a"])
+    wait_for(lambda: subscriptions)
+    mirror.subscribe(["b"])
+    wait_for(lambda: subscriptions[-1] == ["a", "b"])
+
+    stats = mirror.stats()
+    assert stats["resubscriptions"] == len(subscriptions) - 1
+    assert stats["reconnects"] == 0
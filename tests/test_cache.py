@@ -0,0 +1,56 @@
+import asyncio
+
+import server
+import upstream
+from cache import MarketCache
+
+
+def market(cid):
+    return {
+        "condition_id": cid,
+        "question": f"Question {cid}?",
+        "tokens": [
+            {"token_id": f"{cid}-yes", "outcome": "Yes", "price": 0.6},
+            {"token_id": f"{cid}-no", "outcome": "No", "price": 0.4},
+        ],
+    }
+
+
+def test_static_view_is_rebuilt_from_a_fresh_payload():
+    cache = MarketCache(maxsize=4)
+    cache.put(market("a"))
+    cache.static.pop("a")  # evicted while the payload is still fresh
+
+    static = cache.get_static("a")
+    assert [t["outcome"] for t in static["tokens"]] == ["Yes", "No"]
+    assert "price" not in static["tokens"][0]
+
+
+def test_seeds_do_not_evict_fetched_markets():
+    cache = MarketCache(maxsize=4)
+    cache.put(market("a"))
+    for i in range(100):
+        cache.seed_tokens(f"s{i}", "Seeded?", [f"s{i}-yes"], ["Yes"])
+
+    assert cache.static.get("a") is not None
+    assert cache.get_static("s99")["question"] == "Seeded?"
+
+
+def test_market_static_survives_a_small_cache(monkeypatch):
+    monkeypatch.setattr(server, "MARKET_CACHE", MarketCache(maxsize=4))
+    fetched = []
+
+    async def aget_json(path, params=None):
+        fetched.append(path)
+        return market(path.rsplit("/", 1)[1])
+
+    monkeypatch.setattr(upstream, "aget_json", aget_json)
+
+    async def main():
+        await server._aget_market("a")
+        server.MARKET_CACHE.static.pop("a")
+        return await server._aget_market_static("a")
+
+    static = asyncio.run(main())
+    assert static["question"] == "Question a?"
+    assert fetched == ["/markets/a"]
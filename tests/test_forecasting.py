@@ -0,0 +1,31 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stands in for server.py: logs every process that runs it.
+SCRIPT = """
+import os, sys
+sys.path.insert(0, {root!r})
+with open({log!r}, "a") as f:
+    f.write(f"{{os.getpid()}}\\n")
+import forecasting
+
+if __name__ == "__main__":
+    forecasting.WORKERS = 2
+    forecasting.warm_up()
+"""
+
+
+def test_workers_do_not_rerun_the_main_module(tmp_path):
+    log = tmp_path / "runs.txt"
+    script = tmp_path / "main.py"
+    script.write_text(SCRIPT.format(root=ROOT, log=str(log)))
+
+    out = subprocess.run(
+        [sys.executable, str(script)], capture_output=True, text=True, timeout=120
+    )
+
+    assert out.returncode == 0, out.stderr
+    assert len(log.read_text().split()) == 1
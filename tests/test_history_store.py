@@ -0,0 +1,36 @@
+import os
+
+from history_store import PriceHistoryStore
+
+
+def points(n, start=1_700_000_000):
+    return [{"t": start + 60 * i, "p": 0.5} for i in range(n)]
+
+
+def test_compact_returns_evicted_pages_to_disk(tmp_path):
+    store = PriceHistoryStore(str(tmp_path), max_series=1, compact_interval=1e9)
+    for token in ("a", "b", "c"):
+        store.append(token, 1, points(20_000))
+    store.read("c", 1)  # most recently read: the one kept
+    store._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    size = os.path.getsize(store.path)
+
+    store.compact()
+
+    assert store._conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert os.path.getsize(store.path) < size / 2
+    assert store.read("a", 1) == [] and len(store.read("c", 1)) == 20_000
+
+
+def test_state_tracks_the_stored_range(tmp_path):
+    store = PriceHistoryStore(str(tmp_path))
+    assert store.state("a", 1) == (None, None, 0.0)
+
+    store.append("a", 1, points(3, start=1000), since=900)
+    since, last_t, _ = store.state("a", 1)
+    assert (since, last_t) == (900, 1120)
+
+    store.append("a", 1, points(1, start=2000))  # tail: range start unchanged
+    store.append("a", 1, points(1, start=500), since=400)  # backfill
+    since, last_t, _ = store.state("a", 1)
+    assert (since, last_t) == (400, 2000)
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+import history_store
+import server
+import upstream
+from history_store import PriceHistoryStore
+
+NOW = 1_760_000_000
+
+
+@pytest.fixture
+def requests_made(tmp_path, monkeypatch):
+    """
+    Server wired to a fresh history store and a fake `/prices-history` that
+    records the parameters of every request.
+    """
+    made = []
+
+    async def aget_json(path, params=None):
+        assert path == "/prices-history"
+        made.append(dict(params))
+        end = params.get("endTs", NOW)
+        start = params.get("startTs", NOW - 100 * 86400)
+        return {"history": [{"t": t, "p": 0.5} for t in range(start, end + 1, 3600)]}
+
+    monkeypatch.setattr(server, "_history_store_obj", PriceHistoryStore(str(tmp_path)))
+    monkeypatch.setattr(server, "HISTORY_STORE_ENABLED", True)
+    monkeypatch.setattr(server.time, "time", lambda: NOW)
+    monkeypatch.setattr(upstream, "aget_json", aget_json)
+    server.HISTORY_CACHE.clear()
+    return made
+
+
+def graph(interval):
+    return asyncio.run(server._fetch_history("tok", interval, 1, None, None))
+
+
+def test_first_sync_fetches_only_the_window(requests_made):
+    graph("1h")
+
+    assert requests_made == [{"market": "tok", "fidelity": 1, "startTs": NOW - 3600}]
+
+
+def test_later_syncs_fetch_the_tail_and_backfill_wider_windows(
+    requests_made, monkeypatch
+):
+    monkeypatch.setattr(history_store, "SYNC_INTERVAL", 0)
+    for interval in ("1h", "1h", "1d", "max", "1w"):
+        server.HISTORY_CACHE.clear()
+        graph(interval)
+
+    tok = {"market": "tok", "fidelity": 1}
+    tail = {**tok, "startTs": NOW + 1, "endTs": NOW}  # the fake's last point is NOW
+    assert requests_made == [
+        {**tok, "startTs": NOW - 3600},
+        tail,
+        {**tok, "startTs": NOW - 86400, "endTs": NOW - 3600},
+        tail,
+        {**tok, "interval": "max"},
+        tail,
+    ]
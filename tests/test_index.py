@@ -0,0 +1,150 @@
+import os
+import sys
+
+import pytest
+
+import index
+import lexical
+import market_store
+import upstream
+from lexical import LexicalIndex
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+from fake_clob import FakeClob, Fixtures  # noqa: E402
+
+
+class StubEmbedder:
+    """
+    Stands in for `embeddings.Embedder`: a fixed vector per text, no model.
+    """
+
+    def __init__(self, cache_path):
+        self.computed = 0
+        self.cached = 0
+
+    def embed(self, texts):
+        self.computed += len(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def indexer(tmp_path, monkeypatch):
+    """
+    Point `index.py` at a fake CLOB and a fresh Chroma/state directory;
+    returns the fixtures the fake CLOB serves (set `.markets` before a run).
+    """
+    import chromadb
+
+    fixtures = Fixtures([])
+    clob = FakeClob(fixtures)
+    monkeypatch.setattr(upstream, "CLOB_HOST", clob.start())
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    monkeypatch.setattr(
+        index,
+        "_collection_obj",
+        client.get_or_create_collection(
+            name="prediction_markets", embedding_function=None
+        ),
+    )
+    monkeypatch.setattr(index, "Embedder", StubEmbedder)
+
+    state = str(tmp_path / "state")
+    for name in ("CURSOR_FILE", "SEEN_FILE", "EXISTING_FILE", "LEXICAL_FILE"):
+        path = os.path.join(state, os.path.basename(getattr(index, name)))
+        monkeypatch.setattr(index, name, path)
+    monkeypatch.setattr(index, "STATE_DIR", state)
+
+    store = str(tmp_path / "market_store")
+    monkeypatch.setattr(market_store, "STORE_DIR", store)
+    monkeypatch.setattr(market_store, "STAGING_DIR", os.path.join(store, "staging"))
+    monkeypatch.setattr(market_store._store_files, "__defaults__", (store,))
+    lexical_path = str(tmp_path / "lexical_index.pkl")
+    monkeypatch.setattr(lexical, "INDEX_PATH", lexical_path)
+    monkeypatch.setattr(LexicalIndex.save, "__defaults__", (lexical_path,))
+    yield fixtures
+    clob.stop()
+
+
+def serve(fixtures, markets):
+    fixtures.markets = markets
+    fixtures.by_id = {m["condition_id"]: m for m in markets}
+
+
+def test_lexical_index_does_not_need_pyarrow(indexer, monkeypatch):
+    monkeypatch.setattr(market_store, "pa", None)
+    markets = Fixtures.synthetic(250).markets
+    serve(indexer, markets)
+
+    index.index_markets(resume=False)
+
+    idx = LexicalIndex.load(lexical.INDEX_PATH)
+    assert sorted(idx.ids) == sorted(m["condition_id"] for m in markets)
+    assert idx.exact_matches(markets[7]["market_slug"]) == [markets[7]["condition_id"]]
+    assert not os.path.exists(index.LEXICAL_FILE)
+
+
+class CrashingEmbedder(StubEmbedder):
+    """
+    Dies while embedding the third page, like a run killed mid-page.
+    """
+
+    calls = 0
+
+    def embed(self, texts):
+        CrashingEmbedder.calls += 1
+        if CrashingEmbedder.calls == 3:
+            raise RuntimeError("killed")
+        return super().embed(texts)
+
+
+def test_full_run_then_noop_rerun(indexer):
+    serve(indexer, Fixtures.synthetic(250).markets)
+
+    first = index.index_markets(resume=False)
+    second = index.index_markets(resume=False)
+
+    assert first == {"added": 250, "changed": 0, "unchanged": 0, "removed": 0}
+    assert second == {"added": 0, "changed": 0, "unchanged": 250, "removed": 0}
+    assert index._collection().count() == 250
+
+
+def test_edit_and_deletion(indexer):
+    markets = Fixtures.synthetic(250).markets
+    serve(indexer, markets)
+    index.index_markets(resume=False)
+
+    edited = [dict(m) for m in markets]
+    edited[3]["question"] += " (amended)"  # document change: re-embedded
+    edited[4]["volume"] += 1000  # metadata-only change
+    removed = edited.pop(5)["condition_id"]
+    serve(indexer, edited)
+    counts = index.index_markets(resume=False)
+
+    assert counts == {"added": 0, "changed": 2, "unchanged": 247, "removed": 1}
+    assert not index._collection().get(ids=[removed])["ids"]
+    meta = index._collection().get(ids=[edited[4]["condition_id"]])["metadatas"][0]
+    assert meta["volume"] == edited[4]["volume"]
+    assert removed not in LexicalIndex.load(lexical.INDEX_PATH).ids
+
+
+def test_crash_then_resume(indexer, monkeypatch):
+    markets = Fixtures.synthetic(450).markets
+    serve(indexer, markets)
+    monkeypatch.setattr(index, "Embedder", CrashingEmbedder)
+    monkeypatch.setattr(CrashingEmbedder, "calls", 0)
+
+    with pytest.raises(RuntimeError):
+        index.index_markets(resume=False)
+    assert index._load_checkpoint()["counts"]["added"] == 200
+
+    counts = index.index_markets()
+
+    assert counts == {"added": 450, "changed": 0, "unchanged": 0, "removed": 0}
+    assert index._collection().count() == 450
+    assert index._load_checkpoint() is None
+    assert sorted(LexicalIndex.load(lexical.INDEX_PATH).ids) == sorted(
+        m["condition_id"] for m in markets
+    )
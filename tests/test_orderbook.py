@@ -0,0 +1,76 @@
+import pytest
+
+from orderbook import OrderBook, shape_book
+
+SNAPSHOT = {
+    "asset_id": "tok",
+    "timestamp": "1000",
+    "bids": [
+        {"price": "0.40", "size": "10"},
+        {"price": "0.45", "size": "20"},
+        {"price": "0.42", "size": "30"},
+    ],
+    "asks": [
+        {"price": "0.55", "size": "5"},
+        {"price": "0.50", "size": "15"},
+        {"price": "0.60", "size": "25"},
+    ],
+}
+
+
+def prices(levels):
+    return [lvl["price"] for lvl in levels]
+
+
+def test_load_orders_levels_like_rest():
+    book = OrderBook("tok")
+    book.load(SNAPSHOT)
+
+    data = book.to_dict()
+    assert book.ready
+    assert data["timestamp"] == "1000"
+    # REST order: best price last on both sides
+    assert prices(data["bids"]) == ["0.40", "0.42", "0.45"]
+    assert prices(data["asks"]) == ["0.60", "0.55", "0.50"]
+
+
+def test_apply_sets_and_removes_levels():
+    book = OrderBook("tok")
+    book.load(SNAPSHOT)
+
+    assert book.apply("BUY", "0.46", "7", 1001)
+    assert book.apply("SELL", "0.50", "0", 1002)
+    assert book.apply("BUY", "0.40", "0", 1003)
+    assert book.apply("BUY", "0.42", "31", 1004)
+
+    data = book.to_dict()
+    assert [(lvl["price"], lvl["size"]) for lvl in data["bids"]] == [
+        ("0.42", "31"),
+        ("0.45", "20"),
+        ("0.46", "7"),
+    ]
+    assert prices(data["asks"]) == ["0.60", "0.55"]
+    assert data["timestamp"] == "1004"
+
+
+def test_apply_ignores_stale_updates():
+    book = OrderBook("tok")
+    book.load(SNAPSHOT)
+
+    assert not book.apply("BUY", "0.45", "0", 999)
+    assert "0.45" in prices(book.to_dict()["bids"])
+
+
+def test_shape_book_lists_best_levels_first():
+    book = OrderBook("tok")
+    book.load(SNAPSHOT)
+
+    shaped = shape_book(book.to_dict(), depth=2, fmt="arrays")
+    assert shaped["bids"]["prices"] == [0.45, 0.42]
+    assert shaped["asks"]["prices"] == [0.5, 0.55]
+
+
+@pytest.mark.parametrize("args", [{"depth": -1}, {"bucket": 0}, {"bucket": -0.01}])
+def test_shape_book_rejects_bad_arguments(args):
+    with pytest.raises(ValueError):
+        shape_book(SNAPSHOT, **args)
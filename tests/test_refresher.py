@@ -0,0 +1,52 @@
+from types import SimpleNamespace
+
+import refresher
+from refresher import HotSet, Refresher
+
+
+class FakeClock:
+    """
+    Stands in for both `time.monotonic` and the stop event: waiting advances
+    the clock, and the refresher stops after `cycles` waits.
+    """
+
+    def __init__(self, cycles):
+        self.now = 0.0
+        self.cycles = cycles
+        self.waits = []
+
+    def monotonic(self):
+        return self.now
+
+    def wait(self, timeout):
+        self.waits.append(round(timeout, 6))
+        self.now += timeout
+        return len(self.waits) > self.cycles
+
+
+def run_cycles(monkeypatch, cycle_seconds, cycles=4):
+    clock = FakeClock(cycles)
+    monkeypatch.setattr(refresher, "time", SimpleNamespace(monotonic=clock.monotonic))
+
+    def step():
+        clock.now += cycle_seconds
+
+    hot = HotSet()
+    hot.touch("market")
+    r = Refresher(hot, lambda key: [(1, step)], interval=1.0)
+    r._stop = SimpleNamespace(wait=clock.wait)
+    r._run()
+    return r, clock.waits
+
+
+def test_cycles_start_on_a_fixed_period(monkeypatch):
+    r, waits = run_cycles(monkeypatch, cycle_seconds=0.3)
+
+    assert r.cycles == 4
+    assert waits == [1.0, 0.7, 0.7, 0.7, 0.7]
+
+
+def test_overrunning_cycle_is_followed_by_one_more(monkeypatch):
+    r, waits = run_cycles(monkeypatch, cycle_seconds=2.5)
+
+    assert waits == [1.0, 0.0, 0.0, 0.0, 0.0]
@@ -0,0 +1,18 @@
+import numpy as np
+
+from series import lttb
+
+
+def test_lttb_keeps_endpoints_and_size():
+    x = np.arange(1000)
+    y = np.sin(x / 50.0)
+    keep = lttb(x, y, 100)
+    assert len(keep) == 100
+    assert keep[0] == 0 and keep[-1] == 999
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_without_a_series_keeps_every_point():
+    x = np.arange(50)
+    assert np.array_equal(lttb(x, np.zeros(0), 10), x)
+    assert np.array_equal(lttb(x, np.zeros(20), 10), x)
@@ -0,0 +1,315 @@
+"""
+upstream.py — Shared HTTP access to the Polymarket CLOB REST API
+
+All tools (and `index.py`) talk to the CLOB through this module so that
+connections are pooled, requests time out, transient failures are retried with
+jittered exponential backoff, and the request rate stays under the CLOB limits.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from metrics import METRICS
+
+# ─── Configuration ─────────────────────────────────────────────────────────
+load_dotenv()
+LOGGER = logging.getLogger(__name__)
+
+CLOB_HOST = os.getenv("CLOB_HOST", "https://clob.polymarket.com").rstrip("/")
+MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "20"))
+CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", "10"))
+TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+RETRIES = int(os.getenv("UPSTREAM_RETRIES", "4"))
+BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.25"))
+BACKOFF_CAP = float(os.getenv("UPSTREAM_BACKOFF_CAP", "8"))
+# Requests per second (and burst) allowed towards the CLOB from this process.
+RATE = float(os.getenv("UPSTREAM_RATE", "20"))
+BURST = float(os.getenv("UPSTREAM_BURST", "50"))
+# Async responses larger than this are decoded on a worker thread, so a long
+# price history does not stall the event loop while it is parsed.
+THREAD_DECODE_BYTES = int(os.getenv("UPSTREAM_THREAD_DECODE_BYTES", "262144"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# ─── Rate Limiting ─────────────────────────────────────────────────────────
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by the sync and async request paths.
+
+    `reserve()` takes a token immediately (the balance may go negative) and
+    returns how long the caller must wait before using it, so waiting happens
+    outside the lock and callers are served in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._last) * self.rate
+            )
+            self._last = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+BUCKET = TokenBucket(RATE, BURST)
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """
+    Full-jitter exponential backoff, overridden by a numeric Retry-After.
+    """
+    if retry_after:
+        try:
+            return min(BACKOFF_CAP, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF * 2**attempt))
+
+
+# ─── Request Coalescing ────────────────────────────────────────────────────
+class SingleFlight:
+    """
+    Collapse concurrent identical calls into one.
+
+    While a call for `key` is in flight, further callers with the same key wait
+    for its result (or exception) instead of issuing their own. `saved` counts
+    the calls that were answered this way.
+    """
+
+    def __init__(self) -> None:
+        self.saved = 0
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Dict[str, Any]] = {}
+        self._futures: Dict[Hashable, asyncio.Task] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+            else:
+                self.saved += 1
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"]
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # The shared call runs as its own task: cancelling any one waiter
+        # (the first caller included) never cancels it for the others.
+        loop = asyncio.get_running_loop()
+        fkey = (id(loop), key)
+        task = self._futures.get(fkey)
+        if task is not None:
+            self.saved += 1
+        else:
+            task = self._futures[fkey] = loop.create_task(fn())
+
+            def done(t: asyncio.Task) -> None:
+                self._futures.pop(fkey, None)
+                if not t.cancelled():
+                    t.exception()  # mark retrieved when every waiter left
+
+            task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._calls) + len(self._futures), "saved": self.saved}
+
+
+FLIGHTS = SingleFlight()
+
+
+def _flight_key(path: str, params: Optional[Dict[str, Any]]) -> Hashable:
+    return path, tuple(sorted((params or {}).items()))
+
+
+# ─── Instrumentation ───────────────────────────────────────────────────────
+def _route(path: str) -> str:
+    """
+    Path with ids collapsed ("/markets/0x..." -> "/markets/{id}") for labels.
+    """
+    parts = path.split("/")
+    return "/".join(parts[:2] + ["{id}"] * (len(parts) > 2))
+
+
+def _record(path: str, seconds: float, status: str, size: int = 0) -> None:
+    route = _route(path)
+    METRICS.observe("upstream_seconds", seconds, route=route)
+    METRICS.inc("upstream_requests_total", route=route, status=status)
+    if size:
+        METRICS.inc("upstream_bytes_total", size, route=route)
+
+
+# ─── Sync client ───────────────────────────────────────────────────────────
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=MAX_CONNECTIONS, pool_maxsize=MAX_CONNECTIONS
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_json(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    GET `path` from the CLOB host and decode the JSON body.
+
+    Blocking counterpart of `aget_json`, for scripts and synchronous tools.
+    Identical requests already in flight on other threads are shared.
+    """
+    return FLIGHTS.do(_flight_key(path, params), lambda: _get_json(path, params))
+
+
+def _get_json(path: str, params: Optional[Dict[str, Any]]) -> Any:
+    session = _get_session()
+    url = f"{CLOB_HOST}{path}"
+    for attempt in range(RETRIES + 1):
+        time.sleep(BUCKET.reserve())
+        t0 = time.perf_counter()
+        try:
+            resp = session.get(url, params=params, timeout=TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _record(path, time.perf_counter() - t0, "error")
+            if attempt == RETRIES:
+                raise
+            delay = _retry_delay(attempt)
+            LOGGER.warning("GET %s failed (%s); retrying in %.2fs", path, e, delay)
+            time.sleep(delay)
+            continue
+        _record(
+            path, time.perf_counter() - t0, str(resp.status_code), len(resp.content)
+        )
+        if resp.status_code in RETRY_STATUSES and attempt < RETRIES:
+            delay = _retry_delay(attempt, resp.headers.get("Retry-After"))
+            LOGGER.warning(
+                "GET %s returned %s; retrying in %.2fs", path, resp.status_code, delay
+            )
+            time.sleep(delay)
+            continue
+        resp.raise_for_status()
+        return resp.json()
+
+
+# ─── Async client ──────────────────────────────────────────────────────────
+# httpx pools and asyncio semaphores belong to the loop that created them, so
+# they are rebuilt whenever a different event loop starts using this module.
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_loop, _async_client, _semaphore
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            base_url=CLOB_HOST,
+            timeout=TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_CONNECTIONS,
+            ),
+        )
+        _semaphore = asyncio.Semaphore(CONCURRENCY)
+        _async_loop = loop
+    return _async_client
+
+
+async def aget_json(path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    GET `path` from the CLOB host and decode the JSON body.
+
+    At most `UPSTREAM_CONCURRENCY` requests run at once per event loop, and
+    identical requests already in flight on the loop are shared.
+    """
+    return await FLIGHTS.ado(
+        _flight_key(path, params), lambda: _aget_json(path, params)
+    )
+
+
+async def _aget_json(path: str, params: Optional[Dict[str, Any]]) -> Any:
+    client = _get_async_client()
+    for attempt in range(RETRIES + 1):
+        async with _semaphore:
+            await asyncio.sleep(BUCKET.reserve())
+            t0 = time.perf_counter()
+            try:
+                resp = await client.get(path, params=params)
+            except httpx.TransportError as e:
+                _record(path, time.perf_counter() - t0, "error")
+                if attempt == RETRIES:
+                    raise
+                resp, delay = None, _retry_delay(attempt)
+                LOGGER.warning("GET %s failed (%s); retrying in %.2fs", path, e, delay)
+        if resp is None:
+            await asyncio.sleep(delay)
+            continue
+        _record(
+            path, time.perf_counter() - t0, str(resp.status_code), len(resp.content)
+        )
+        if resp.status_code in RETRY_STATUSES and attempt < RETRIES:
+            delay = _retry_delay(attempt, resp.headers.get("Retry-After"))
+            LOGGER.warning(
+                "GET %s returned %s; retrying in %.2fs", path, resp.status_code, delay
+            )
+            await asyncio.sleep(delay)
+            continue
+        resp.raise_for_status()
+        if len(resp.content) > THREAD_DECODE_BYTES:
+            return await asyncio.to_thread(json.loads, resp.content)
+        return resp.json()
+
+
+async def aclose() -> None:
+    """
+    Close the pooled async client, if one was opened.
+    """
+    global _async_loop, _async_client, _semaphore
+    if _async_client is not None:
+        await _async_client.aclose()
+    _async_loop, _async_client, _semaphore = None, None, None